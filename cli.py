@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+import config
+
+EXPORT_FIELDS = ("user_id", "query", "response", "timestamp")
+
+
+def read_batches(path: str, batch_size: int) -> Iterator[List[Tuple[int, str]]]:
+    """Yield (line number, line) batches without reading the whole file"""
+    batch = []
+    with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as f:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                batch.append((line_number, line))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+class Progress:
+    """Progress and throughput readout on stderr"""
+    
+    def __init__(self, label: str):
+        self.label = label
+        self.ok = 0
+        self.failed = 0
+        self.start_time = time.time()
+    
+    def update(self, ok: int, failed: int = 0):
+        self.ok += ok
+        self.failed += failed
+        elapsed = time.time() - self.start_time
+        rate = self.ok / elapsed if elapsed > 0 else 0.0
+        print(
+            f"\r{self.label}: {self.ok} ok, {self.failed} failed, {rate:.0f} entries/s",
+            end="",
+            file=sys.stderr,
+            flush=True
+        )
+    
+    def finish(self):
+        elapsed = time.time() - self.start_time
+        print(file=sys.stderr)
+        print(
+            f"{self.label} finished: {self.ok} ok, {self.failed} failed in {elapsed:.1f}s",
+            file=sys.stderr
+        )
+
+
+async def import_jsonl(path: str, batch_size: int, workers: int):
+    """Embed and bulk-insert query/response pairs from a JSONL file"""
+    from pydantic import ValidationError
+    
+    from database.storage import get_storage_backend, initialize_storage
+    from models.pydantic_models import CacheEntry
+    from services.embedding_service import get_embedding_service
+    from services.embedding_workers import EmbeddingProcessPool
+    from utils.logger import logger
+    
+    await initialize_storage()
+    storage = get_storage_backend()
+    
+    # The in-flight batch limit below is the import's backpressure
+    config.EMBEDDING_MAX_QUEUE_DEPTH = 0
+    
+    pool: Optional[EmbeddingProcessPool] = None
+    embedding_service = None
+    if workers > 0:
+        pool = EmbeddingProcessPool(workers, threads_per_process=0)
+    else:
+        embedding_service = get_embedding_service()
+    
+    progress = Progress("import")
+    
+    async def process_batch(batch: List[Tuple[int, str]]):
+        entries = []
+        failed = 0
+        for line_number, line in batch:
+            try:
+                entries.append(CacheEntry(**json.loads(line)))
+            except (ValueError, TypeError, ValidationError) as e:
+                logger.warning(f"Skipping line {line_number}: {e}")
+                failed += 1
+        
+        # Embed entries that don't carry their own vector
+        missing = [entry for entry in entries if not entry.embedding]
+        if missing:
+            texts = [entry.query for entry in missing]
+            if pool is not None:
+                embeddings = (await pool.encode(texts)).tolist()
+            else:
+                embeddings = await embedding_service.generate_embeddings_batch(texts)
+            for entry, embedding in zip(missing, embeddings):
+                entry.embedding = embedding
+        
+        ready = [entry for entry in entries if entry.embedding]
+        failed += len(entries) - len(ready)
+        results = await storage.insert_cache_entries([entry.to_dict() for entry in ready])
+        progress.update(sum(results), failed + len(results) - sum(results))
+    
+    # Bound memory by limiting the number of batches in flight
+    max_in_flight = max(1, workers) * 2
+    in_flight = set()
+    try:
+        for batch in read_batches(path, batch_size):
+            in_flight.add(asyncio.ensure_future(process_batch(batch)))
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+        if in_flight:
+            await asyncio.gather(*in_flight)
+    finally:
+        progress.finish()
+        if pool is not None:
+            pool.close()
+        await storage.close()
+
+
+async def export_jsonl(output: str, user_id: Optional[str], with_embeddings: bool):
+    """Stream cache entries to a JSONL file"""
+    from database.storage import get_storage_backend
+    
+    storage = get_storage_backend()
+    progress = Progress("export")
+    
+    out = open(output, "w", encoding="utf-8")
+    try:
+        async for doc in storage.iter_entries(user_id, include_embedding=with_embeddings):
+            record = {field: doc[field] for field in EXPORT_FIELDS if field in doc}
+            timestamp = record.get("timestamp")
+            if isinstance(timestamp, datetime):
+                if timestamp.tzinfo is None:
+                    timestamp = timestamp.replace(tzinfo=timezone.utc)
+                record["timestamp"] = timestamp.isoformat()
+            if with_embeddings:
+                record["embedding"] = doc.get("embedding")
+            
+            out.write(json.dumps(record) + "\n")
+            progress.update(1)
+    finally:
+        out.close()
+        progress.finish()
+        await storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import/export for the semantic cache")
+    parser.add_argument("--database", help="Override MONGODB_DATABASE")
+    parser.add_argument("--collection", help="Override MONGODB_COLLECTION")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    import_parser = subparsers.add_parser("import", help="Embed and insert entries from a JSONL file")
+    import_parser.add_argument("path", help="JSONL file of {user_id, query, response[, timestamp, embedding]} ('-' for stdin)")
+    import_parser.add_argument("--batch-size", type=int, default=256, help="Entries embedded and inserted per batch")
+    import_parser.add_argument("--workers", type=int, default=0, help="Embedding worker processes (0 embeds in-process)")
+    
+    export_parser = subparsers.add_parser("export", help="Stream entries to a JSONL file")
+    export_parser.add_argument("--output", required=True, help="Output JSONL file")
+    export_parser.add_argument("--user-id", help="Only export this user's entries")
+    export_parser.add_argument("--with-embeddings", action="store_true", help="Include embeddings as float lists")
+    
+    args = parser.parse_args()
+    
+    # Select the namespace before any storage backend is created
+    if args.database:
+        config.MONGODB_DATABASE = args.database
+    if args.collection:
+        config.MONGODB_COLLECTION = args.collection
+    
+    if args.command == "import":
+        asyncio.run(import_jsonl(args.path, args.batch_size, args.workers))
+    else:
+        asyncio.run(export_jsonl(args.output, args.user_id, args.with_embeddings))
+
+
+if __name__ == "__main__":
+    main()
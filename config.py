@@ -13,12 +13,26 @@ DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 SERVICE_HOST = os.getenv("SERVICE_HOST", "0.0.0.0")
 SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8183"))
 
+# Storage backend: "mongodb" (Atlas), "memory" (exact NumPy search, not persisted)
+# or "file" (memory backend persisted to STORAGE_FILE_PATH)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongodb").lower()
+STORAGE_FILE_PATH = os.getenv("STORAGE_FILE_PATH", "data/cache.jsonl")
+
 # MongoDB Atlas configuration
 MONGODB_URI = os.getenv("MONGODB_URI")
 MONGODB_DATABASE = os.getenv("MONGODB_DATABASE", "semantic_cache")
 MONGODB_COLLECTION = os.getenv("MONGODB_COLLECTION", "cache")
 VECTOR_SEARCH_INDEX_NAME = os.getenv("VECTOR_SEARCH_INDEX_NAME", "cache_vector_index")
 
+# Embedding storage format: "array" (BSON doubles) or an Atlas BSON vector
+# (binData subtype 9): "float32", "int8" or "binary" (packed bits, Hamming distance)
+VECTOR_STORAGE_FORMAT = os.getenv("VECTOR_STORAGE_FORMAT", "array").lower()
+
+# Vector search index: similarity ("cosine", "dotProduct" for normalized vectors,
+# "euclidean") and Atlas automatic quantization ("none", "scalar", "binary")
+VECTOR_SIMILARITY = os.getenv("VECTOR_SIMILARITY", "cosine")
+VECTOR_INDEX_QUANTIZATION = os.getenv("VECTOR_INDEX_QUANTIZATION", "none").lower()
+
 # Cache configuration
 CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "86400"))  # 24 hours
 SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.85"))
@@ -26,9 +40,105 @@ SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.85"))
 # Embedding configuration (all-MiniLM-L6-v2)
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 EMBEDDING_DIMENSIONS = 384  # all-MiniLM-L6-v2 output dimension
+# Inference runtime: "torch" (PyTorch eager) or "onnx" (ONNX Runtime on CPU, needs sentence-transformers[onnx])
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# ONNX graph to load from the model repo, e.g. "onnx/model_O3.onnx" for the optimized graph
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+# Weight quantization: "none" or "int8" (torch dynamic quantization, or the int8 ONNX graph)
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "none").lower()
+# Compare int8 against fp32 embeddings at startup and warn below this cosine
+EMBEDDING_QUANTIZATION_CHECK = os.getenv("EMBEDDING_QUANTIZATION_CHECK", "True").lower() == "true"
+EMBEDDING_QUANTIZATION_MIN_COSINE = float(os.getenv("EMBEDDING_QUANTIZATION_MIN_COSINE", "0.98"))
+EMBEDDING_CALIBRATION_FILE = os.getenv("EMBEDDING_CALIBRATION_FILE", "")  # one text per line
+
+# Longest input in word-piece tokens; longer texts are truncated (all-MiniLM-L6-v2 default: 256)
+EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "256"))
+# Sort multi-text encodes by token count and encode them in buckets of similar length
+EMBEDDING_LENGTH_BUCKETING = os.getenv("EMBEDDING_LENGTH_BUCKETING", "True").lower() == "true"
+EMBEDDING_ENCODE_BATCH_SIZE = int(os.getenv("EMBEDDING_ENCODE_BATCH_SIZE", "32"))
+
+# Embedding worker processes, each with its own model copy (0 encodes in the API process)
+EMBEDDING_WORKER_PROCESSES = int(os.getenv("EMBEDDING_WORKER_PROCESSES", "0"))
+EMBEDDING_WORKER_THREADS = int(os.getenv("EMBEDDING_WORKER_THREADS", "0"))  # torch threads per process, 0 = cores / processes
+
+# Dedicated in-process embedding executor and its backpressure limit
+EMBEDDING_EXECUTOR_WORKERS = int(os.getenv("EMBEDDING_EXECUTOR_WORKERS", "1"))
+EMBEDDING_TORCH_THREADS = int(os.getenv("EMBEDDING_TORCH_THREADS", "0"))  # 0 keeps the torch default
+EMBEDDING_MAX_QUEUE_DEPTH = int(os.getenv("EMBEDDING_MAX_QUEUE_DEPTH", "1000"))  # texts; 0 = unbounded
+
+# Coalesce concurrent single-text embeddings into one model call
+EMBEDDING_BATCH_ENABLED = os.getenv("EMBEDDING_BATCH_ENABLED", "True").lower() == "true"
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "2"))
+
+# Exact-text embedding cache (LRU bounded by entries and memory)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "64"))
+
+# Try an indexed exact match on the normalized query hash before vector search
+EXACT_MATCH_ENABLED = os.getenv("EXACT_MATCH_ENABLED", "True").lower() == "true"
+
+# Let identical concurrent lookups share one embedding and search
+LOOKUP_SINGLE_FLIGHT_ENABLED = os.getenv("LOOKUP_SINGLE_FLIGHT_ENABLED", "True").lower() == "true"
+
+# Answer lookups from users without live entries with cache_miss before embedding
+USER_MEMBERSHIP_ENABLED = os.getenv("USER_MEMBERSHIP_ENABLED", "False").lower() == "true"
+USER_MEMBERSHIP_REFRESH_SECONDS = int(os.getenv("USER_MEMBERSHIP_REFRESH_SECONDS", "300"))
+
+# In-process L1 vector tier (per-user float32 matrices searched before Atlas)
+L1_CACHE_ENABLED = os.getenv("L1_CACHE_ENABLED", "False").lower() == "true"
+L1_CACHE_MAX_ENTRIES = int(os.getenv("L1_CACHE_MAX_ENTRIES", "50000"))
+L1_CACHE_MAX_ENTRIES_PER_USER = int(os.getenv("L1_CACHE_MAX_ENTRIES_PER_USER", "128"))
+L1_CACHE_TTL_SECONDS = int(os.getenv("L1_CACHE_TTL_SECONDS", "300"))
+
+# Keep embeddings from missed lookups briefly so the follow-up save can reuse them
+MISS_EMBEDDING_TTL_SECONDS = int(os.getenv("MISS_EMBEDDING_TTL_SECONDS", "300"))  # 0 disables
+MISS_EMBEDDING_MAX_ENTRIES = int(os.getenv("MISS_EMBEDDING_MAX_ENTRIES", "10000"))
+
+# Write-behind: buffer saves in memory and flush them with insert_many
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "False").lower() == "true"
+WRITE_BEHIND_MAX_DOCS = int(os.getenv("WRITE_BEHIND_MAX_DOCS", "500"))
+WRITE_BEHIND_FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "100"))
+WRITE_BEHIND_MAX_BUFFER_DOCS = int(os.getenv("WRITE_BEHIND_MAX_BUFFER_DOCS", "10000"))
+
+# Async save mode: /save_to_cache answers 202 and background workers save in batches
+ASYNC_SAVE_ENABLED = os.getenv("ASYNC_SAVE_ENABLED", "False").lower() == "true"
+ASYNC_SAVE_QUEUE_SIZE = int(os.getenv("ASYNC_SAVE_QUEUE_SIZE", "10000"))
+ASYNC_SAVE_WORKERS = int(os.getenv("ASYNC_SAVE_WORKERS", "2"))
+ASYNC_SAVE_MAX_BATCH_SIZE = int(os.getenv("ASYNC_SAVE_MAX_BATCH_SIZE", "64"))
+ASYNC_SAVE_MAX_WAIT_MS = float(os.getenv("ASYNC_SAVE_MAX_WAIT_MS", "10"))
+ASYNC_SAVE_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("ASYNC_SAVE_SHUTDOWN_TIMEOUT_SECONDS", "30"))
+
+# Durable local spool for MongoDB writes that fail, replayed once the cluster is reachable
+WRITE_SPOOL_ENABLED = os.getenv("WRITE_SPOOL_ENABLED", "False").lower() == "true"
+WRITE_SPOOL_PATH = os.getenv("WRITE_SPOOL_PATH", "data/write_spool.jsonl")
+WRITE_SPOOL_MAX_MB = float(os.getenv("WRITE_SPOOL_MAX_MB", "256"))
+WRITE_SPOOL_REPLAY_BATCH_SIZE = int(os.getenv("WRITE_SPOOL_REPLAY_BATCH_SIZE", "500"))
+WRITE_SPOOL_RETRY_SECONDS = float(os.getenv("WRITE_SPOOL_RETRY_SECONDS", "1"))
+WRITE_SPOOL_MAX_BACKOFF_SECONDS = float(os.getenv("WRITE_SPOOL_MAX_BACKOFF_SECONDS", "60"))
+
+# Save-time dedup: refresh a matching entry instead of inserting a copy
+SAVE_DEDUP_MODE = os.getenv("SAVE_DEDUP_MODE", "off").lower()  # "off", "hash" or "similarity"
+SAVE_DEDUP_THRESHOLD = float(os.getenv("SAVE_DEDUP_THRESHOLD", "0.98"))
 
 DEFAULT_NUM_CANDIDATES = int(os.getenv("DEFAULT_NUM_CANDIDATES", "1000"))
 MAX_QUERY_LIMIT = int(os.getenv("MAX_QUERY_LIMIT", "10"))
+# Adaptive numCandidates: exact search for small users, bounded ANN for large ones
+ADAPTIVE_CANDIDATES_ENABLED = os.getenv("ADAPTIVE_CANDIDATES_ENABLED", "False").lower() == "true"
+ADAPTIVE_EXACT_MAX_ENTRIES = int(os.getenv("ADAPTIVE_EXACT_MAX_ENTRIES", "2000"))
+ADAPTIVE_MIN_NUM_CANDIDATES = int(os.getenv("ADAPTIVE_MIN_NUM_CANDIDATES", "100"))
+ADAPTIVE_CANDIDATE_RATIO = float(os.getenv("ADAPTIVE_CANDIDATE_RATIO", "0.05"))
+ADAPTIVE_COUNT_REFRESH_SECONDS = int(os.getenv("ADAPTIVE_COUNT_REFRESH_SECONDS", "60"))
+ADAPTIVE_COUNT_MAX_USERS = int(os.getenv("ADAPTIVE_COUNT_MAX_USERS", "100000"))
+# Document fields returned by vector search (response is always returned, the embedding never)
+VECTOR_SEARCH_RETURN_FIELDS = ["response"] + [
+    field.strip() for field in os.getenv("VECTOR_SEARCH_RETURN_FIELDS", "response").split(",")
+    if field.strip() and field.strip() not in ("embedding", "response")
+]
+
+# Maximum number of items accepted by the batch endpoints
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100"))
 
 # Monitoring
 LOG_VECTOR_METRICS = True
@@ -0,0 +1,118 @@
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from bson import Binary, json_util
+from bson.binary import BinaryVectorDtype
+
+import config
+from database.memory import InMemoryBackend
+from database.storage import entry_expiry
+from utils.logger import logger
+
+
+class FileBackend(InMemoryBackend):
+    """InMemoryBackend persisted to an append-only JSONL file"""
+    
+    def __init__(self, path: str = config.STORAGE_FILE_PATH):
+        self.path = path
+        super().__init__()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        loaded, skipped = self._load()
+        if skipped:
+            # Drop expired and unreadable entries from the file
+            self._rewrite()
+        self._file = open(self.path, "a", encoding="utf-8")
+        logger.info(f"Loaded {loaded} cache entries from {self.path} ({skipped} skipped)")
+    
+    @staticmethod
+    def _serialize(entry: Dict[str, Any]) -> str:
+        """Encode an entry as one JSON line with a compact float32 embedding"""
+        doc = dict(entry)
+        doc["embedding"] = Binary.from_vector(
+            [float(value) for value in doc["embedding"]], BinaryVectorDtype.FLOAT32
+        )
+        return json_util.dumps(doc) + "\n"
+    
+    @staticmethod
+    def _deserialize(line: str) -> Dict[str, Any]:
+        """Decode one JSON line back into an entry"""
+        doc = json_util.loads(line)
+        doc["embedding"] = list(doc["embedding"].as_vector().data)
+        return doc
+    
+    def _load(self):
+        """Rebuild the in-memory index from the file, skipping expired entries"""
+        loaded = skipped = 0
+        if not os.path.exists(self.path):
+            return loaded, skipped
+        
+        # Later lines for the same _id are updates that supersede earlier ones
+        docs: Dict[Any, Dict[str, Any]] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    doc = self._deserialize(line)
+                except (ValueError, KeyError, AttributeError) as e:
+                    logger.warning(f"Skipping unreadable line in {self.path}: {e}")
+                    skipped += 1
+                    continue
+                
+                if doc.get("_id") in docs:
+                    skipped += 1
+                docs[doc.get("_id")] = doc
+        
+        for doc in docs.values():
+            if entry_expiry(doc.get("timestamp")) <= time.time():
+                skipped += 1
+                continue
+            self._add(doc)
+            loaded += 1
+        
+        return loaded, skipped
+    
+    def _rewrite(self):
+        """Atomically replace the file with the current live entries"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for user_entries in self._users.values():
+                for row in range(len(user_entries)):
+                    f.write(self._serialize(user_entries.entry(row)))
+        os.replace(tmp_path, self.path)
+    
+    async def close(self):
+        """Close the append handle"""
+        self._file.close()
+    
+    async def insert_cache_entries(self, entries: List[Dict[str, Any]]) -> List[bool]:
+        """Insert entries and append them to the file"""
+        results = await super().insert_cache_entries(entries)
+        self._file.write("".join(
+            self._serialize(entry) for entry, success in zip(entries, results) if success
+        ))
+        self._file.flush()
+        return results
+    
+    async def update_cache_entry(self, user_id: str, entry_id: Any, fields: Dict[str, Any]) -> bool:
+        """Update an entry and append its new version to the file"""
+        if not await super().update_cache_entry(user_id, entry_id, fields):
+            return False
+        
+        user_entries = self._users[user_id]
+        self._file.write(self._serialize(user_entries.entry(user_entries.rows[entry_id])))
+        self._file.flush()
+        return True
+    
+    async def delete_cache_entries(self, user_id: Optional[str] = None) -> int:
+        """Delete entries and compact the file"""
+        deleted = await super().delete_cache_entries(user_id)
+        self._file.close()
+        self._rewrite()
+        self._file = open(self.path, "a", encoding="utf-8")
+        return deleted
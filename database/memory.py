@@ -0,0 +1,259 @@
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+import config
+from database.storage import entry_expiry
+from monitoring.metrics import metrics
+from utils.logger import logger
+from utils.vectors import similarity_scores, to_unit_vector
+
+
+class _UserEntries:
+    """One user's documents with their unit vectors in a contiguous float32 matrix
+    
+    Documents are stored without their embedding; the matrix row is the only copy.
+    """
+    
+    def __init__(self):
+        self.docs: List[Dict[str, Any]] = []
+        self.matrix = np.empty((0, config.EMBEDDING_DIMENSIONS), dtype=np.float32)
+        self.expires_at = np.empty(0, dtype=np.float64)
+        # _id -> row, and normalized query hash -> _id of its newest entry
+        self.rows: Dict[Any, int] = {}
+        self.exact: Dict[str, Any] = {}
+    
+    def __len__(self) -> int:
+        return len(self.docs)
+    
+    def append(self, doc: Dict[str, Any], vector: np.ndarray, expires_at: float):
+        """Add a document, growing the matrix geometrically"""
+        count = len(self.docs)
+        if count == len(self.matrix):
+            new_size = max(16, 2 * count)
+            self.matrix = np.resize(self.matrix, (new_size, self.matrix.shape[1]))
+            self.expires_at = np.resize(self.expires_at, new_size)
+        
+        self.docs.append(doc)
+        self.matrix[count] = vector
+        self.expires_at[count] = expires_at
+        self.rows[doc["_id"]] = count
+        if doc.get("query_hash"):
+            self.exact[doc["query_hash"]] = doc["_id"]
+    
+    def find_exact(self, query_hash: str) -> Optional[int]:
+        """Live row of the newest entry with a normalized query hash"""
+        row = self.rows.get(self.exact.get(query_hash))
+        if row is None or self.expires_at[row] <= time.time():
+            return None
+        return row
+    
+    def entry(self, row: int) -> Dict[str, Any]:
+        """A copy of a row's document with its embedding rebuilt from the matrix"""
+        doc = dict(self.docs[row])
+        doc["embedding"] = self.matrix[row].tolist()
+        return doc
+    
+    def search(self, query: np.ndarray) -> Tuple[Optional[int], float]:
+        """Exact search over live rows, returning the best row and its score"""
+        expired = self.expires_at[:len(self.docs)] <= time.time()
+        
+        # Compact once a quarter of the rows have expired
+        if expired.any() and expired.sum() * 4 >= len(self.docs):
+            self.keep(~expired)
+            expired = np.zeros(len(self.docs), dtype=bool)
+        
+        count = len(self.docs)
+        if count == 0:
+            return None, 0.0
+        
+        scores = similarity_scores(self.matrix[:count], query)
+        scores[expired] = -np.inf
+        best = int(np.argmax(scores))
+        return (best, float(scores[best])) if np.isfinite(scores[best]) else (None, 0.0)
+    
+    def keep(self, mask: np.ndarray):
+        """Keep only the rows selected by mask"""
+        count = len(self.docs)
+        self.docs = [doc for doc, keep in zip(self.docs, mask) if keep]
+        self.matrix = self.matrix[:count][mask].copy()
+        self.expires_at = self.expires_at[:count][mask].copy()
+        self.rows = {doc["_id"]: row for row, doc in enumerate(self.docs)}
+        self.exact = {query_hash: entry_id for query_hash, entry_id in self.exact.items() if entry_id in self.rows}
+
+
+class InMemoryBackend:
+    """Exact NumPy storage backend kept entirely in process memory"""
+    
+    def __init__(self):
+        self._users: Dict[str, _UserEntries] = {}
+        logger.info(f"{type(self).__name__} initialized")
+    
+    async def ping(self):
+        """Always reachable"""
+        return None
+    
+    async def close(self):
+        """Nothing to release"""
+        return None
+    
+    async def insert_cache_entry(self, entry: Dict[str, Any]) -> bool:
+        """Insert a cache entry"""
+        return (await self.insert_cache_entries([entry]))[0]
+    
+    async def insert_cache_entries(self, entries: List[Dict[str, Any]]) -> List[bool]:
+        """Insert multiple cache entries"""
+        results = []
+        for entry in entries:
+            try:
+                self._add(entry)
+                results.append(True)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Failed to insert cache entry: {e}")
+                results.append(False)
+        
+        succeeded = sum(results)
+        metrics.increment_counter("cache_writes", value=succeeded, labels={"status": "success"})
+        if succeeded < len(entries):
+            metrics.increment_counter("cache_writes", value=len(entries) - succeeded, labels={"status": "error"})
+        return results
+    
+    def _add(self, entry: Dict[str, Any]):
+        """Index an entry; like the driver, assigns _id on the passed document"""
+        vector = to_unit_vector(entry["embedding"])
+        if vector.shape != (config.EMBEDDING_DIMENSIONS,):
+            raise ValueError(f"Expected {config.EMBEDDING_DIMENSIONS}-d embedding, got {vector.shape}")
+        
+        entry.setdefault("_id", ObjectId())
+        doc = {key: value for key, value in entry.items() if key != "embedding"}
+        expires_at = entry_expiry(doc.get("timestamp"))
+        
+        self._users.setdefault(doc["user_id"], _UserEntries()).append(doc, vector, expires_at)
+    
+    async def update_cache_entry(self, user_id: str, entry_id: Any, fields: Dict[str, Any]) -> bool:
+        """Set fields on an existing entry, returning whether it was found"""
+        user_entries = self._users.get(user_id)
+        if user_entries is None:
+            return False
+        
+        row = user_entries.rows.get(entry_id)
+        if row is None:
+            return False
+        
+        doc = user_entries.docs[row]
+        doc.update(fields)
+        if "timestamp" in fields:
+            user_entries.expires_at[row] = entry_expiry(doc["timestamp"])
+        metrics.increment_counter("cache_updates", labels={"status": "success"})
+        return True
+    
+    @staticmethod
+    def _project(user_entries: _UserEntries, row: int, include_embedding: bool = False) -> Dict[str, Any]:
+        """Return the configured result fields of a row's document"""
+        doc = user_entries.docs[row]
+        result = {"_id": doc["_id"]}
+        result.update({field: doc[field] for field in config.VECTOR_SEARCH_RETURN_FIELDS if field in doc})
+        if include_embedding:
+            result["embedding"] = user_entries.matrix[row].tolist()
+            result["query_hash"] = doc.get("query_hash")
+        return result
+    
+    async def find_exact(
+        self,
+        user_id: str,
+        query_hash: str,
+        include_embedding: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Find the newest entry with the given normalized query hash"""
+        user_entries = self._users.get(user_id)
+        row = user_entries.find_exact(query_hash) if user_entries is not None else None
+        
+        metrics.increment_counter("exact_match_total", labels={"result": "miss" if row is None else "hit"})
+        return self._project(user_entries, row, include_embedding) if row is not None else None
+    
+    async def vector_search(
+        self,
+        user_id: str,
+        embedding: List[float],
+        threshold: float = config.SIMILARITY_THRESHOLD,
+        num_candidates: int = config.DEFAULT_NUM_CANDIDATES,
+        exact: bool = False,
+        include_embedding: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Perform exact vector search over the user's entries (num_candidates is ignored)"""
+        
+        start_time = time.time()
+        
+        user_entries = self._users.get(user_id)
+        best, score = (None, 0.0)
+        if user_entries is not None:
+            best, score = user_entries.search(to_unit_vector(embedding))
+        
+        search_time = (time.time() - start_time) * 1000
+        metrics.record_histogram("vector_search_latency_ms", search_time)
+        
+        if best is not None and score >= threshold:
+            logger.info(f"Vector search hit in {search_time:.2f}ms (score: {score})")
+            metrics.increment_counter("vector_search_total", labels={"result": "hit"})
+            result = self._project(user_entries, best, include_embedding)
+            result["vector_score"] = score
+            return result
+        
+        logger.info(f"Vector search miss in {search_time:.2f}ms")
+        metrics.increment_counter("vector_search_total", labels={"result": "miss"})
+        return None
+    
+    async def count_entries(self, user_id: str) -> Optional[int]:
+        """Count a user's live entries"""
+        user_entries = self._users.get(user_id)
+        if user_entries is None:
+            return 0
+        return int((user_entries.expires_at[:len(user_entries)] > time.time()).sum())
+    
+    async def user_expiries(self) -> Optional[Dict[str, float]]:
+        """Epoch seconds at which each user's newest entry expires"""
+        return {
+            user_id: float(entries.expires_at[:len(entries)].max())
+            for user_id, entries in self._users.items() if len(entries)
+        }
+    
+    async def delete_cache_entries(self, user_id: Optional[str] = None) -> int:
+        """Delete a user's cache entries, or all entries when no user is given"""
+        if user_id is None:
+            deleted = sum(len(entries) for entries in self._users.values())
+            self._users.clear()
+        else:
+            entries = self._users.pop(user_id, None)
+            deleted = len(entries) if entries else 0
+        
+        logger.info(f"Deleted {deleted} cache entries (user: {user_id or 'all'})")
+        return deleted
+    
+    async def iter_entries(
+        self,
+        user_id: Optional[str] = None,
+        include_embedding: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a user's live entries, or all live entries"""
+        users = [user_id] if user_id is not None else list(self._users)
+        now = time.time()
+        
+        for user in users:
+            user_entries = self._users.get(user)
+            if user_entries is None:
+                continue
+            for row in range(len(user_entries)):
+                if user_entries.expires_at[row] <= now:
+                    continue
+                yield user_entries.entry(row) if include_embedding else dict(user_entries.docs[row])
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics"""
+        return {
+            "backend": config.STORAGE_BACKEND,
+            "entries": sum(len(entries) for entries in self._users.values()),
+            "users": len(self._users),
+            "vector_bytes": sum(entries.matrix.nbytes for entries in self._users.values())
+        }
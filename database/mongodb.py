@@ -1,66 +1,81 @@
 import asyncio
+import random
 import time
-from typing import Any, Dict, List, Optional
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 
 import pymongo
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+from bson import Binary, ObjectId
+from pymongo import AsyncMongoClient
+from pymongo.errors import (
+    BulkWriteError, ConnectionFailure, ExecutionTimeout, PyMongoError, WTimeoutError
+)
 
 import config
+from database.spool import WriteSpool
+from database.storage import entry_expiry
 from monitoring.metrics import metrics
+from services import AtlasBinDataVectorOptimizer, VectorType
 from utils.logger import logger
 
+# Errors after which a write may succeed on retry (ConnectionFailure covers
+# AutoReconnect, NetworkTimeout and ServerSelectionTimeoutError)
+TRANSIENT_WRITE_ERRORS = (ConnectionFailure, ExecutionTimeout, WTimeoutError)
+
+
+def encode_embedding(embedding: Union[List[float], Binary]) -> Union[List[float], Binary]:
+    """Convert an embedding to the configured VECTOR_STORAGE_FORMAT"""
+    if config.VECTOR_STORAGE_FORMAT == "array" or isinstance(embedding, Binary):
+        return embedding
+    return AtlasBinDataVectorOptimizer.encode_vector_atlas(
+        embedding, VectorType(config.VECTOR_STORAGE_FORMAT)
+    )
+
+
+def decode_embedding(embedding: Union[List[float], Binary]) -> List[float]:
+    """Convert a stored embedding back to a float list"""
+    if isinstance(embedding, Binary):
+        return AtlasBinDataVectorOptimizer.decode_vector_atlas(embedding)
+    return list(embedding)
+
 
 class MongoDBSetup:
     """Handles one-time MongoDB setup operations"""
     
     @staticmethod
-    def initialize_database():
+    async def initialize_database(client: AsyncMongoClient):
         """Initialize database, collections, and indexes - call once at startup"""
         try:
-            # Create connection for setup
-            client = MongoClient(
-                config.MONGODB_URI,
-                maxPoolSize=50,
-                minPoolSize=5,
-                maxIdleTimeMS=30000,
-                serverSelectionTimeoutMS=5000,
-                connectTimeoutMS=10000,
-                retryWrites=True,
-                w="majority",
-                readPreference="primaryPreferred"
-            )
-            
             # Test connection
-            client.admin.command('ismaster')
+            await client.admin.command('ismaster')
             logger.info("Successfully connected to MongoDB Atlas for setup")
             
             db = client[config.MONGODB_DATABASE]
             cache_collection = db[config.MONGODB_COLLECTION]
             
             # Setup collection and indexes
-            MongoDBSetup._setup_collection(db, cache_collection)
-            
-            # Close setup connection
-            client.close()
-            logger.info("MongoDB setup completed and setup connection closed")
+            await MongoDBSetup._setup_collection(db, cache_collection)
+            logger.info("MongoDB setup completed")
             
         except PyMongoError as e:
             logger.error(f"Failed to initialize MongoDB: {e}")
             raise
     
     @staticmethod
-    def _setup_collection(db, cache_collection):
+    async def _setup_collection(db, cache_collection):
         """Setup collection and indexes"""
         try:
             # Create collection if it doesn't exist
-            if cache_collection.name not in db.list_collection_names():
-                db.create_collection(cache_collection.name)
+            if cache_collection.name not in await db.list_collection_names():
+                await db.create_collection(cache_collection.name)
                 logger.info(f"Created collection: {cache_collection.name}")
             
             # Setup indexes
-            MongoDBSetup._setup_vector_search_index(cache_collection)
-            MongoDBSetup._setup_ttl_indexes(cache_collection)
+            await MongoDBSetup._setup_vector_search_index(cache_collection)
+            await MongoDBSetup._setup_ttl_indexes(cache_collection)
+            await MongoDBSetup._setup_query_hash_index(cache_collection)
+            if config.USER_MEMBERSHIP_ENABLED:
+                await MongoDBSetup._setup_user_timestamp_index(cache_collection)
             
             logger.info("Collection setup completed")
             
@@ -69,33 +84,80 @@ class MongoDBSetup:
             raise
     
     @staticmethod
-    def _setup_vector_search_index(cache_collection):
-        """Setup vector search index"""
+    def _build_vector_index_definition() -> Dict[str, Any]:
+        """Build the vector search index definition from config"""
+        similarity = config.VECTOR_SIMILARITY
+        if config.VECTOR_STORAGE_FORMAT == "binary" and similarity != "euclidean":
+            # Packed-bit vectors only support Hamming (euclidean) similarity
+            logger.warning(f"VECTOR_SIMILARITY={similarity} is not supported for binary vectors, using euclidean")
+            similarity = "euclidean"
+        
+        vector_field = {
+            "type": "vector",
+            "path": "embedding",
+            "numDimensions": config.EMBEDDING_DIMENSIONS,
+            "similarity": similarity
+        }
+        
+        if config.VECTOR_INDEX_QUANTIZATION != "none":
+            if config.VECTOR_STORAGE_FORMAT in ("int8", "binary"):
+                logger.warning(
+                    f"Ignoring VECTOR_INDEX_QUANTIZATION={config.VECTOR_INDEX_QUANTIZATION}: "
+                    f"{config.VECTOR_STORAGE_FORMAT} vectors are already quantized"
+                )
+            else:
+                vector_field["quantization"] = config.VECTOR_INDEX_QUANTIZATION
+        
+        return {
+            "fields": [
+                vector_field,
+                {"type": "filter", "path": "user_id"},
+            ]
+        }
+    
+    @staticmethod
+    def _index_definition_drifted(existing: Dict[str, Any], desired: Dict[str, Any]) -> bool:
+        """Check whether an existing index definition differs from the desired one"""
+        existing_fields = {field.get("path"): field for field in existing.get("fields", [])}
+        desired_fields = {field["path"]: field for field in desired["fields"]}
+        
+        if existing_fields.keys() != desired_fields.keys():
+            return True
+        
+        for path, field in desired_fields.items():
+            current = existing_fields[path]
+            if current.get("quantization", "none") != field.get("quantization", "none"):
+                return True
+            if any(current.get(key) != value for key, value in field.items() if key != "quantization"):
+                return True
+        
+        return False
+    
+    @staticmethod
+    async def _setup_vector_search_index(cache_collection):
+        """Setup vector search index, updating it if its definition has drifted"""
         try:
+            definition = MongoDBSetup._build_vector_index_definition()
             vector_index_definition = {
                 "name": config.VECTOR_SEARCH_INDEX_NAME,
                 "type": "vectorSearch",
-                "definition": {
-                    "fields": [
-                        {
-                            "type": "vector",
-                            "path": "embedding",
-                            "numDimensions": config.EMBEDDING_DIMENSIONS,
-                            "similarity": "cosine"
-                        },
-                        {"type": "filter", "path": "user_id"},
-                    ]
-                }
+                "definition": definition
             }
             
             # Check if vector search index already exists
             try:
-                existing_indexes = list(cache_collection.list_search_indexes())
-                index_exists = any(idx.get("name") == config.VECTOR_SEARCH_INDEX_NAME for idx in existing_indexes)
+                existing_indexes = await (await cache_collection.list_search_indexes()).to_list()
+                existing = next(
+                    (idx for idx in existing_indexes if idx.get("name") == config.VECTOR_SEARCH_INDEX_NAME),
+                    None
+                )
                 
-                if not index_exists:
-                    cache_collection.create_search_index(model=vector_index_definition)
+                if existing is None:
+                    await cache_collection.create_search_index(model=vector_index_definition)
                     logger.info(f"Vector search index setup prepared: {config.VECTOR_SEARCH_INDEX_NAME}")
+                elif MongoDBSetup._index_definition_drifted(existing.get("latestDefinition", {}), definition):
+                    await cache_collection.update_search_index(config.VECTOR_SEARCH_INDEX_NAME, definition)
+                    logger.info(f"Vector search index definition changed, update submitted: {config.VECTOR_SEARCH_INDEX_NAME}")
                 else:
                     logger.info(f"Vector search index already exists: {config.VECTOR_SEARCH_INDEX_NAME}")
                     
@@ -106,14 +168,14 @@ class MongoDBSetup:
             logger.error(f"Failed to setup vector index: {e}")
     
     @staticmethod
-    def _setup_ttl_indexes(cache_collection):
+    async def _setup_ttl_indexes(cache_collection):
         """Setup TTL indexes for automatic cleanup"""
         try:
-            index_info = cache_collection.index_information()
+            index_info = await cache_collection.index_information()
             
             # Main TTL index
             if "timestamp_ttl_idx" not in index_info:
-                cache_collection.create_index(
+                await cache_collection.create_index(
                     [("timestamp", pymongo.ASCENDING)],
                     expireAfterSeconds=config.CACHE_TTL_SECONDS,
                     name="timestamp_ttl_idx"
@@ -124,10 +186,53 @@ class MongoDBSetup:
                 
         except PyMongoError as e:
             logger.error(f"Failed to setup TTL indexes: {e}")
+    
+    @staticmethod
+    async def _setup_query_hash_index(cache_collection):
+        """Setup the compound index used by exact-match lookups"""
+        try:
+            index_info = await cache_collection.index_information()
+            
+            if "user_query_hash_idx" not in index_info:
+                await cache_collection.create_index(
+                    [
+                        ("user_id", pymongo.ASCENDING),
+                        ("query_hash", pymongo.ASCENDING),
+                        ("timestamp", pymongo.DESCENDING)
+                    ],
+                    name="user_query_hash_idx"
+                )
+                logger.info("Created exact-match query hash index")
+            else:
+                logger.info("Query hash index already exists")
+                
+        except PyMongoError as e:
+            logger.error(f"Failed to setup query hash index: {e}")
+    
+    @staticmethod
+    async def _setup_user_timestamp_index(cache_collection):
+        """Setup the index that lets the user membership scan read one key per user"""
+        try:
+            index_info = await cache_collection.index_information()
+            
+            if "user_timestamp_idx" not in index_info:
+                await cache_collection.create_index(
+                    [
+                        ("user_id", pymongo.ASCENDING),
+                        ("timestamp", pymongo.DESCENDING)
+                    ],
+                    name="user_timestamp_idx"
+                )
+                logger.info("Created user membership index")
+            else:
+                logger.info("User membership index already exists")
+                
+        except PyMongoError as e:
+            logger.error(f"Failed to setup user membership index: {e}")
 
 
 class MongoDBManager:
-    """MongoDB Manager"""
+    """MongoDB Manager backed by the async PyMongo driver"""
     
     _instance = None
     _lock = asyncio.Lock()
@@ -143,8 +248,8 @@ class MongoDBManager:
             return
             
         try:
-            # MongoDB connection
-            self.client = MongoClient(
+            # MongoDB connection (shared with MongoDBSetup at startup)
+            self.client = AsyncMongoClient(
                 config.MONGODB_URI,
                 maxPoolSize=50,
                 minPoolSize=5,
@@ -156,14 +261,21 @@ class MongoDBManager:
                 readPreference="primaryPreferred"
             )
             
-            # Test connection
-            self.client.admin.command('ismaster')
-            logger.info("Successfully connected to MongoDB Atlas")
-            
             # Initialize database and collection references
             self.db = self.client[config.MONGODB_DATABASE]
             self.cache_collection = self.db[config.MONGODB_COLLECTION]
             
+            # Write-behind buffer (see WRITE_BEHIND_ENABLED)
+            self._write_buffer: List[Dict[str, Any]] = []
+            self._flush_lock = asyncio.Lock()
+            self._flush_event = asyncio.Event()
+            self._flush_task: Optional[asyncio.Task] = None
+            self._flush_stop = asyncio.Event()
+            
+            # Local spool for writes that fail (see WRITE_SPOOL_ENABLED)
+            self.spool = WriteSpool() if config.WRITE_SPOOL_ENABLED else None
+            self._replay_task: Optional[asyncio.Task] = None
+            
             self._initialized = True
             logger.info("MongoDB Manager initialized successfully")
             
@@ -171,10 +283,43 @@ class MongoDBManager:
             logger.error(f"Failed to initialize MongoDB Manager: {e}")
             raise
     
-    def insert_cache_entry(self, entry: Dict[str, Any]) -> bool:
+    async def ping(self):
+        """Check connectivity to the cluster"""
+        await self.client.admin.command('ismaster')
+    
+    async def close(self):
+        """Flush buffered writes, then close the client and its connection pool"""
+        # Let the flusher finish its current insert rather than cancelling it mid-batch
+        self._flush_stop.set()
+        if self._flush_task is not None:
+            self._flush_event.set()
+            await self._flush_task
+            self._flush_task = None
+        await self.flush_write_buffer()
+        if self._replay_task is not None:
+            self._replay_task.cancel()
+            try:
+                await self._replay_task
+            except asyncio.CancelledError:
+                pass
+            self._replay_task = None
+        if self.spool is not None:
+            self.spool.close()
+        await self.client.close()
+        logger.info("MongoDB connection closed")
+    
+    async def insert_cache_entry(self, entry: Dict[str, Any]) -> bool:
         """Insert a cache entry"""
+        entry["embedding"] = encode_embedding(entry["embedding"])
+        
+        if config.WRITE_BEHIND_ENABLED:
+            return await self._buffer_entry(entry)
+        
+        if self._spool_pending():
+            return self._spool_entries([entry])
+        
         try:
-            result = self.cache_collection.insert_one(entry)
+            result = await self.cache_collection.insert_one(entry)
             success = bool(result.inserted_id)
             
             if success:
@@ -184,18 +329,254 @@ class MongoDBManager:
                 
             return success
             
+        except TRANSIENT_WRITE_ERRORS as e:
+            if self.spool is not None:
+                logger.warning(f"Spooling cache entry after failed insert: {e}")
+                return self._spool_entries([entry])
+            logger.error(f"Failed to insert cache entry: {e}")
+            metrics.increment_counter("cache_writes", labels={"status": "error"})
+            return False
+            
         except PyMongoError as e:
             logger.error(f"Failed to insert cache entry: {e}")
             metrics.increment_counter("cache_writes", labels={"status": "error"})
             return False
     
+    async def insert_cache_entries(self, entries: List[Dict[str, Any]]) -> List[bool]:
+        """Insert multiple cache entries with one unordered insert_many"""
+        if not entries:
+            return []
+        
+        for entry in entries:
+            entry["embedding"] = encode_embedding(entry["embedding"])
+        
+        if self._spool_pending():
+            return [self._spool_entries(entries)] * len(entries)
+        
+        try:
+            await self.cache_collection.insert_many(entries, ordered=False)
+            results = [True] * len(entries)
+            
+        except BulkWriteError as e:
+            # Duplicate keys are entries already written by an earlier, interrupted attempt
+            failed = {
+                error["index"] for error in e.details.get("writeErrors", []) if error.get("code") != 11000
+            }
+            results = [i not in failed for i in range(len(entries))]
+            if failed:
+                logger.error(f"Bulk insert failed for {len(failed)} of {len(entries)} cache entries")
+            
+        except TRANSIENT_WRITE_ERRORS as e:
+            if self.spool is not None:
+                logger.warning(f"Spooling {len(entries)} cache entries after failed insert: {e}")
+                return [self._spool_entries(entries)] * len(entries)
+            logger.error(f"Failed to insert {len(entries)} cache entries: {e}")
+            metrics.increment_counter("cache_writes", value=len(entries), labels={"status": "error"})
+            return [False] * len(entries)
+            
+        except PyMongoError as e:
+            logger.error(f"Failed to insert {len(entries)} cache entries: {e}")
+            metrics.increment_counter("cache_writes", value=len(entries), labels={"status": "error"})
+            return [False] * len(entries)
+        
+        succeeded = sum(results)
+        metrics.increment_counter("cache_writes", value=succeeded, labels={"status": "success"})
+        if succeeded < len(entries):
+            metrics.increment_counter("cache_writes", value=len(entries) - succeeded, labels={"status": "failed"})
+        return results
+    
+    def _spool_pending(self) -> bool:
+        """Whether earlier writes are still waiting in the spool"""
+        return self.spool is not None and self.spool.depth > 0
+    
+    def _spool_entries(self, entries: List[Dict[str, Any]]) -> bool:
+        """Append entries to the spool for the replayer to insert later"""
+        # Keep the _id so a replay of a write that did land is a harmless duplicate
+        for entry in entries:
+            entry.setdefault("_id", ObjectId())
+        
+        if not self.spool.append(entries):
+            metrics.increment_counter("cache_writes", value=len(entries), labels={"status": "error"})
+            return False
+        
+        metrics.increment_counter("cache_writes", value=len(entries), labels={"status": "spooled"})
+        self.start_spool_replayer()
+        return True
+    
+    def start_spool_replayer(self):
+        """Start the background spool replayer if the spool is enabled"""
+        if self.spool is not None and (self._replay_task is None or self._replay_task.done()):
+            self._replay_task = asyncio.create_task(self._run_spool_replayer())
+    
+    async def _run_spool_replayer(self):
+        """Replay spooled entries in batches, backing off while the cluster is unavailable"""
+        delay = config.WRITE_SPOOL_RETRY_SECONDS
+        while True:
+            if not self.spool.depth:
+                await asyncio.sleep(config.WRITE_SPOOL_RETRY_SECONDS)
+                continue
+            
+            try:
+                replayed = await self._replay_spool_batch()
+            except Exception as e:
+                logger.error(f"Write spool replay failed: {e}")
+                replayed = False
+            
+            if replayed:
+                delay = config.WRITE_SPOOL_RETRY_SECONDS
+                continue
+            
+            # Jittered exponential backoff so instances don't retry in lockstep
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, config.WRITE_SPOOL_MAX_BACKOFF_SECONDS)
+    
+    async def _replay_spool_batch(self) -> bool:
+        """Insert one batch from the spool, returning False if the cluster is unavailable"""
+        docs, lines, offset = self.spool.read_batch(config.WRITE_SPOOL_REPLAY_BATCH_SIZE)
+        
+        if docs:
+            try:
+                await self.cache_collection.insert_many(docs, ordered=False)
+                
+            except BulkWriteError as e:
+                # Duplicate keys are entries that were already written
+                dropped = [
+                    error for error in e.details.get("writeErrors", []) if error.get("code") != 11000
+                ]
+                if dropped:
+                    logger.error(f"Dropped {len(dropped)} spooled cache entries: {dropped[0].get('errmsg')}")
+                    metrics.increment_counter("write_spool_dropped", value=len(dropped))
+                    
+            except PyMongoError as e:
+                logger.warning(f"Write spool replay deferred: {e}")
+                return False
+        
+        self.spool.mark_replayed(lines, offset)
+        logger.info(f"Replayed {len(docs)} spooled cache entries ({self.spool.depth} remaining)")
+        return True
+    
+    async def _buffer_entry(self, entry: Dict[str, Any]) -> bool:
+        """Accept an entry into the write-behind buffer"""
+        if not self._flush_stop.is_set() and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._run_flusher())
+        
+        # Backpressure: wait for a flush once the buffer is at its hard limit
+        if len(self._write_buffer) >= config.WRITE_BEHIND_MAX_BUFFER_DOCS:
+            await self.flush_write_buffer()
+        
+        self._write_buffer.append(entry)
+        metrics.set_gauge("write_buffer_depth", len(self._write_buffer))
+        metrics.increment_counter("cache_writes", labels={"status": "buffered"})
+        
+        if len(self._write_buffer) >= config.WRITE_BEHIND_MAX_DOCS:
+            self._flush_event.set()
+        return True
+    
+    async def _run_flusher(self):
+        """Flush the write buffer when it fills up or the flush interval elapses"""
+        while not self._flush_stop.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._flush_event.wait(),
+                    timeout=config.WRITE_BEHIND_FLUSH_MS / 1000
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            
+            try:
+                await self.flush_write_buffer()
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {e}")
+    
+    async def flush_write_buffer(self):
+        """Write all buffered entries with insert_many"""
+        async with self._flush_lock:
+            while self._write_buffer:
+                batch = self._write_buffer[:config.WRITE_BEHIND_MAX_DOCS]
+                del self._write_buffer[:len(batch)]
+                metrics.set_gauge("write_buffer_depth", len(self._write_buffer))
+                
+                start_time = time.time()
+                try:
+                    results = await self.insert_cache_entries(batch)
+                except asyncio.CancelledError:
+                    # Keep the batch for the next flush; entries that did land come back as duplicates
+                    self._write_buffer[:0] = batch
+                    metrics.set_gauge("write_buffer_depth", len(self._write_buffer))
+                    raise
+                flush_time = (time.time() - start_time) * 1000
+                
+                metrics.record_histogram("write_buffer_flush_latency_ms", flush_time)
+                metrics.record_histogram("write_buffer_flush_size", len(batch))
+                logger.debug(f"Flushed {sum(results)}/{len(batch)} buffered cache entries in {flush_time:.2f}ms")
+    
+    async def update_cache_entry(self, user_id: str, entry_id: Any, fields: Dict[str, Any]) -> bool:
+        """Set fields on an existing entry, returning whether it was found"""
+        try:
+            result = await self.cache_collection.update_one(
+                {"_id": entry_id, "user_id": user_id},
+                {"$set": fields}
+            )
+            metrics.increment_counter("cache_updates", labels={"status": "success"})
+            return result.matched_count > 0
+            
+        except PyMongoError as e:
+            logger.error(f"Failed to update cache entry: {e}")
+            metrics.increment_counter("cache_updates", labels={"status": "error"})
+            return False
+    
+    @staticmethod
+    def _result_projection(include_embedding: bool) -> Dict[str, int]:
+        """Projection of the configured result fields, plus what the L1 tier needs"""
+        projection = {field: 1 for field in config.VECTOR_SEARCH_RETURN_FIELDS}
+        if include_embedding:
+            projection.update({"embedding": 1, "query_hash": 1})
+        return projection
+    
+    async def find_exact(
+        self,
+        user_id: str,
+        query_hash: str,
+        include_embedding: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Find the newest entry whose normalized query hash matches exactly"""
+        
+        start_time = time.time()
+        
+        try:
+            result = await self.cache_collection.find_one(
+                {"user_id": user_id, "query_hash": query_hash},
+                projection=self._result_projection(include_embedding),
+                sort=[("timestamp", pymongo.DESCENDING)]
+            )
+            if result and include_embedding:
+                result["embedding"] = decode_embedding(result["embedding"])
+            lookup_time = (time.time() - start_time) * 1000
+            
+            metrics.record_histogram("exact_match_latency_ms", lookup_time)
+            metrics.increment_counter("exact_match_total", labels={"result": "hit" if result else "miss"})
+            
+            if result:
+                logger.info(f"Exact match hit in {lookup_time:.2f}ms")
+            return result
+            
+        except PyMongoError as e:
+            lookup_time = (time.time() - start_time) * 1000
+            logger.error(f"Exact match lookup failed in {lookup_time:.2f}ms: {e}")
+            metrics.increment_counter("exact_match_total", labels={"result": "error"})
+            return None
+    
     async def vector_search(
         self,
         user_id: str,
         embedding: List[float],
-        threshold: float = config.SIMILARITY_THRESHOLD
+        threshold: float = config.SIMILARITY_THRESHOLD,
+        num_candidates: int = config.DEFAULT_NUM_CANDIDATES,
+        exact: bool = False,
+        include_embedding: bool = False
     ) -> Optional[Dict[str, Any]]:
-        """Perform vector search"""
+        """Perform vector search, ANN over num_candidates or exact (ENN)"""
         
         start_time = time.time()
         
@@ -205,19 +586,27 @@ class MongoDBManager:
                 "user_id": {"$eq": user_id}
             }
             
+            vector_search = {
+                "index": config.VECTOR_SEARCH_INDEX_NAME,
+                "path": "embedding",
+                "queryVector": encode_embedding(embedding),
+                "limit": config.MAX_QUERY_LIMIT,
+                "filter": pre_filter
+            }
+            # Exact search scores every filtered document and takes no numCandidates
+            if exact:
+                vector_search["exact"] = True
+            else:
+                vector_search["numCandidates"] = num_candidates
+            
             pipeline = [
                 {
-                    "$vectorSearch": {
-                        "index": config.VECTOR_SEARCH_INDEX_NAME,
-                        "path": "embedding",
-                        "queryVector": embedding,
-                        "numCandidates": config.DEFAULT_NUM_CANDIDATES,
-                        "limit": config.MAX_QUERY_LIMIT,
-                        "filter": pre_filter
-                    }
+                    "$vectorSearch": vector_search
                 },
                 {
-                    "$addFields": {
+                    # Return only the fields callers read; the embedding only when asked for
+                    "$project": {
+                        **self._result_projection(include_embedding),
                         "vector_score": {"$meta": "vectorSearchScore"}
                     }
                 },
@@ -236,7 +625,8 @@ class MongoDBManager:
                 }
             ]
             
-            results = list(self.cache_collection.aggregate(pipeline))
+            cursor = await self.cache_collection.aggregate(pipeline)
+            results = await cursor.to_list()
             search_time = (time.time() - start_time) * 1000
             
             # Record metrics
@@ -245,6 +635,8 @@ class MongoDBManager:
             result = results[0] if results else None
             
             if result:
+                if include_embedding:
+                    result["embedding"] = decode_embedding(result["embedding"])
                 logger.info(f"Vector search hit in {search_time:.2f}ms (score: {result.get('vector_score', 'unknown')})")
                 metrics.increment_counter("vector_search_total", labels={"result": "hit"})
                 return result
@@ -258,10 +650,86 @@ class MongoDBManager:
             logger.error(f"Vector search failed in {search_time:.2f}ms: {e}")
             metrics.increment_counter("vector_search_total", labels={"result": "error"})
             return None
+    
+    async def count_entries(self, user_id: str) -> Optional[int]:
+        """Count a user's entries using the user_id prefix of the query hash index"""
+        try:
+            return await self.cache_collection.count_documents({"user_id": user_id})
+            
+        except PyMongoError as e:
+            logger.error(f"Failed to count cache entries: {e}")
+            return None
+    
+    async def user_expiries(self) -> Optional[Dict[str, float]]:
+        """Epoch seconds at which each user's newest entry expires"""
+        try:
+            # $sort + $group with $first on user_timestamp_idx runs as a DISTINCT_SCAN,
+            # reading one index key per user rather than every document
+            cursor = await self.cache_collection.aggregate([
+                {"$sort": {"user_id": 1, "timestamp": -1}},
+                {"$group": {"_id": "$user_id", "latest": {"$first": "$timestamp"}}}
+            ])
+            return {
+                doc["_id"]: entry_expiry(doc["latest"])
+                async for doc in cursor
+                if isinstance(doc.get("latest"), datetime)
+            }
+            
+        except PyMongoError as e:
+            logger.error(f"Failed to list users with cache entries: {e}")
+            return None
+    
+    async def delete_cache_entries(self, user_id: Optional[str] = None) -> int:
+        """Delete a user's cache entries, or all entries when no user is given"""
+        try:
+            await self.flush_write_buffer()
+            query = {"user_id": user_id} if user_id is not None else {}
+            result = await self.cache_collection.delete_many(query)
+            logger.info(f"Deleted {result.deleted_count} cache entries (user: {user_id or 'all'})")
+            return result.deleted_count
+            
+        except PyMongoError as e:
+            logger.error(f"Failed to delete cache entries: {e}")
+            return 0
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get collection statistics"""
+        try:
+            return {
+                "backend": "mongodb",
+                "entries": await self.cache_collection.estimated_document_count(),
+                "buffered_writes": len(self._write_buffer)
+            }
+            
+        except PyMongoError as e:
+            logger.error(f"Failed to get collection stats: {e}")
+            return {"backend": "mongodb", "error": str(e)}
+    
+    async def iter_entries(
+        self,
+        user_id: Optional[str] = None,
+        include_embedding: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a user's entries, or all entries, through a batched cursor"""
+        query = {"user_id": user_id} if user_id is not None else {}
+        projection = None if include_embedding else {"embedding": 0}
+        
+        cursor = self.cache_collection.find(query, projection=projection, batch_size=1000)
+        try:
+            async for doc in cursor:
+                if include_embedding and "embedding" in doc:
+                    doc["embedding"] = decode_embedding(doc["embedding"])
+                yield doc
+        finally:
+            await cursor.close()
+
 
-def initialize_mongodb():
+async def initialize_mongodb():
     """Initialize MongoDB setup - call this once at app startup"""
-    MongoDBSetup.initialize_database()
+    manager = get_mongodb_manager()
+    await MongoDBSetup.initialize_database(manager.client)
+    # Replay entries spooled before a restart
+    manager.start_spool_replayer()
 
 
 def get_mongodb_manager() -> MongoDBManager:
@@ -0,0 +1,95 @@
+import os
+from typing import Any, Dict, List, Tuple
+
+from bson import json_util
+
+import config
+from monitoring.metrics import metrics
+from utils.logger import logger
+
+
+class WriteSpool:
+    """Append-only JSONL file of cache entries waiting to be written to MongoDB"""
+    
+    def __init__(
+        self,
+        path: str = config.WRITE_SPOOL_PATH,
+        max_bytes: int = int(config.WRITE_SPOOL_MAX_MB * 1024 * 1024)
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._file = open(path, "ab")
+        # Bytes already replayed; entries are removed once the whole file has been replayed
+        self._replayed_offset = 0
+        with open(path, "rb") as f:
+            self.depth = sum(1 for line in f if line.strip())
+        self._update_gauges()
+        
+        if self.depth:
+            logger.info(f"Write spool {path} holds {self.depth} entries to replay")
+    
+    @property
+    def size_bytes(self) -> int:
+        return os.fstat(self._file.fileno()).st_size
+    
+    def _update_gauges(self):
+        metrics.set_gauge("write_spool_depth", self.depth)
+        metrics.set_gauge("write_spool_bytes", self.size_bytes)
+    
+    def append(self, entries: List[Dict[str, Any]]) -> bool:
+        """Durably append entries, or return False when the spool is full"""
+        data = "".join(json_util.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+        if self.size_bytes + len(data) > self.max_bytes:
+            logger.error(f"Write spool is full; dropping {len(entries)} cache entries")
+            metrics.increment_counter("write_spool_dropped", value=len(entries))
+            return False
+        
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        
+        self.depth += len(entries)
+        metrics.increment_counter("write_spool_appended", value=len(entries))
+        self._update_gauges()
+        return True
+    
+    def read_batch(self, max_docs: int) -> Tuple[List[Dict[str, Any]], int, int]:
+        """Read up to max_docs unreplayed entries, returning (docs, lines read, end offset)"""
+        docs = []
+        lines = 0
+        with open(self.path, "rb") as f:
+            f.seek(self._replayed_offset)
+            while lines < max_docs:
+                line = f.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                lines += 1
+                try:
+                    docs.append(json_util.loads(line))
+                except ValueError as e:
+                    logger.warning(f"Skipping unreadable line in {self.path}: {e}")
+            offset = f.tell()
+        return docs, lines, offset
+    
+    def mark_replayed(self, lines: int, offset: int):
+        """Record a replayed batch, emptying the file once everything has been replayed"""
+        self._replayed_offset = offset
+        self.depth = max(0, self.depth - lines)
+        if self._replayed_offset >= self.size_bytes:
+            self._file.truncate(0)
+            self._replayed_offset = 0
+            self.depth = 0
+        
+        metrics.increment_counter("write_spool_replayed", value=lines)
+        self._update_gauges()
+    
+    def close(self):
+        """Close the append handle"""
+        self._file.close()
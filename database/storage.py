@@ -0,0 +1,115 @@
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Protocol
+
+import config
+
+
+def entry_expiry(timestamp: Optional[datetime]) -> float:
+    """Epoch seconds at which an entry expires, mirroring the TTL index"""
+    if timestamp is None:
+        return time.time() + config.CACHE_TTL_SECONDS
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp() + config.CACHE_TTL_SECONDS
+
+
+class StorageBackend(Protocol):
+    """Storage operations the cache service depends on"""
+    
+    async def ping(self) -> None:
+        """Check that the backend is reachable"""
+        ...
+    
+    async def close(self) -> None:
+        """Flush pending writes and release resources"""
+        ...
+    
+    async def insert_cache_entry(self, entry: Dict[str, Any]) -> bool:
+        """Insert a cache entry"""
+        ...
+    
+    async def insert_cache_entries(self, entries: List[Dict[str, Any]]) -> List[bool]:
+        """Insert multiple cache entries, returning per-entry success"""
+        ...
+    
+    async def update_cache_entry(self, user_id: str, entry_id: Any, fields: Dict[str, Any]) -> bool:
+        """Set fields on an existing entry, returning whether it was found"""
+        ...
+    
+    async def find_exact(
+        self,
+        user_id: str,
+        query_hash: str,
+        include_embedding: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Find the newest entry with the given normalized query hash"""
+        ...
+    
+    async def vector_search(
+        self,
+        user_id: str,
+        embedding: List[float],
+        threshold: float = config.SIMILARITY_THRESHOLD,
+        num_candidates: int = config.DEFAULT_NUM_CANDIDATES,
+        exact: bool = False,
+        include_embedding: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Find the most similar entry for the user above threshold
+        
+        With include_embedding the result also carries the entry's embedding
+        (as a float list) and query_hash.
+        """
+        ...
+    
+    async def count_entries(self, user_id: str) -> Optional[int]:
+        """Count a user's entries, or None if they can't be counted"""
+        ...
+    
+    async def user_expiries(self) -> Optional[Dict[str, float]]:
+        """Epoch seconds at which each user's newest entry expires, or None on failure"""
+        ...
+    
+    async def delete_cache_entries(self, user_id: Optional[str] = None) -> int:
+        """Delete a user's cache entries, or all entries when no user is given"""
+        ...
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics"""
+        ...
+    
+    def iter_entries(
+        self,
+        user_id: Optional[str] = None,
+        include_embedding: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a user's entries, or all entries, with embeddings as float lists"""
+        ...
+
+
+@lru_cache(maxsize=1)
+def get_storage_backend() -> StorageBackend:
+    """Get the storage backend selected by STORAGE_BACKEND"""
+    if config.STORAGE_BACKEND == "memory":
+        from database.memory import InMemoryBackend
+        return InMemoryBackend()
+    
+    if config.STORAGE_BACKEND == "file":
+        from database.file_store import FileBackend
+        return FileBackend()
+    
+    if config.STORAGE_BACKEND == "mongodb":
+        from database.mongodb import get_mongodb_manager
+        return get_mongodb_manager()
+    
+    raise ValueError(f"Unknown STORAGE_BACKEND: {config.STORAGE_BACKEND}")
+
+
+async def initialize_storage():
+    """Prepare the selected storage backend - call this once at app startup"""
+    if config.STORAGE_BACKEND == "mongodb":
+        from database.mongodb import initialize_mongodb
+        await initialize_mongodb()
+    else:
+        await get_storage_backend().ping()
@@ -1,15 +1,16 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Response, status
 import uvicorn
 from datetime import datetime
 
 import config
 from utils.logger import logger
 from models.pydantic_models import (
-    QueryRequest, CacheEntry, CacheResponse, CacheSaveResponse,
-    MetricsResponse
+    QueryRequest, BatchQueryRequest, CacheEntry, BatchCacheEntries, CacheResponse,
+    BatchCacheResponse, CacheSaveResponse, BatchSaveResponse, MetricsResponse
 )
 from services.cache_service import get_cache_service, CacheService
-from database.mongodb import get_mongodb_manager,initialize_mongodb
+from services.embedding_service import get_embedding_service
+from database.storage import get_storage_backend, initialize_storage
 from monitoring.metrics import get_metrics
 from contextlib import asynccontextmanager
 from functools import lru_cache
@@ -20,10 +21,10 @@ async def lifespan_context(app: FastAPI):
     """Lifespan event handler for startup and shutdown."""
     try:
         logger.info("Starting semantic cache service...")
-        # Initialize MongoDB setup once at startup
-        initialize_mongodb()
-        logger.info("MongoDB initialization completed")
-        get_cache_service()
+        # Initialize storage (MongoDB setup) once at startup
+        await initialize_storage()
+        logger.info(f"Storage initialization completed ({config.STORAGE_BACKEND})")
+        await get_cache_service().start()
         logger.info("Semantic cache service started successfully")
         
     except Exception as e:
@@ -34,7 +35,9 @@ async def lifespan_context(app: FastAPI):
         yield  # Yield control back to FastAPI
     finally:
         # Cleanup on shutdown
-        pass
+        await get_cache_service().close()
+        await get_embedding_service().close()
+        await get_storage_backend().close()
 
 
 # Initialize FastAPI app
@@ -68,16 +71,16 @@ async def health_check():
 async def detailed_health_check():
     """Detailed health check"""
     try:
-        # Test MongoDB connection
-        mongodb = get_mongodb_manager()
-        mongodb.client.admin.command('ismaster')
+        # Test storage connection
+        storage = get_storage_backend()
+        await storage.ping()
         
         # Test embedding service
         cache_service = get_cache_service()
         test_embedding = await cache_service.embedding_service.generate_embedding("test")
         
         checks = {
-            "mongodb": "healthy" if mongodb else "unhealthy",
+            config.STORAGE_BACKEND: "healthy" if storage else "unhealthy",
             "embedding_service": "healthy" if test_embedding else "unhealthy"
         }
         
@@ -112,12 +115,37 @@ async def get_metrics_endpoint():
 @app.post("/save_to_cache", response_model=CacheSaveResponse)
 async def save_to_cache(
     entry: CacheEntry,
+    response: Response,
     cache_service: CacheService = Depends(get_cache_service_dep)
 ):
     """Save a query-response entry to the semantic cache"""
+    if config.ASYNC_SAVE_ENABLED:
+        if not cache_service.enqueue_save(entry):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Save queue is full",
+                headers={"Retry-After": "1"}
+            )
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"message": "Accepted for saving"}
+    
     return await cache_service.save_to_cache(entry)
 
 
+@app.post("/save_to_cache/batch", response_model=BatchSaveResponse)
+async def save_to_cache_batch(
+    request: BatchCacheEntries,
+    cache_service: CacheService = Depends(get_cache_service_dep)
+):
+    """Save several query-response entries to the semantic cache at once"""
+    if len(request.entries) > config.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch size {len(request.entries)} exceeds the limit of {config.MAX_BATCH_SIZE}"
+        )
+    return await cache_service.save_to_cache_batch(request.entries)
+
+
 @app.post("/read_cache", response_model=CacheResponse)
 async def read_cache(
     request: QueryRequest,
@@ -126,6 +154,20 @@ async def read_cache(
     """Check if a semantically similar query exists in the cache"""
     return await cache_service.lookup_cache(request)
 
+
+@app.post("/read_cache/batch", response_model=BatchCacheResponse)
+async def read_cache_batch(
+    request: BatchQueryRequest,
+    cache_service: CacheService = Depends(get_cache_service_dep)
+):
+    """Check the cache for several queries at once"""
+    if len(request.queries) > config.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch size {len(request.queries)} exceeds the limit of {config.MAX_BATCH_SIZE}"
+        )
+    return await cache_service.lookup_cache_batch(request.queries)
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -3,6 +3,8 @@ from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
+from utils.text import query_hash
+
 
 class QueryRequest(BaseModel):
     """Model for cache lookup requests"""
@@ -10,6 +12,10 @@ class QueryRequest(BaseModel):
     query: str = Field(..., description="The query text to look up")
     threshold: Optional[float] = Field(None, description="Optional similarity threshold (0.0 to 1.0)", ge=0.0, le=1.0)
 
+class BatchQueryRequest(BaseModel):
+    """Model for batch cache lookup requests"""
+    queries: List[QueryRequest] = Field(..., description="Lookups to perform, answered in order")
+
 class CacheEntry(BaseModel):
     """Model for cache entries"""
     user_id: str = Field(..., description="User identifier")
@@ -25,9 +31,16 @@ class CacheEntry(BaseModel):
         # Ensure timestamp is set
         if self.timestamp is None:
             result["timestamp"] = datetime.now(timezone.utc)
+        
+        # Key for exact-match lookups
+        result["query_hash"] = query_hash(self.query)
             
         return result
 
+class BatchCacheEntries(BaseModel):
+    """Model for batch cache save requests"""
+    entries: List[CacheEntry] = Field(..., description="Entries to save")
+
 class CacheResponse(BaseModel):
     """Model for cache lookup responses"""
     response: str = Field(..., description="The cached response or cache_miss if not found")
@@ -35,11 +48,23 @@ class CacheResponse(BaseModel):
     similarity_score: Optional[float] = Field(None, description="Vector similarity score")
     error: Optional[str] = Field(None, description="Error message if applicable")
 
+class BatchCacheResponse(BaseModel):
+    """Model for batch cache lookup responses"""
+    results: List[CacheResponse] = Field(..., description="Per-query results in request order")
+    latency_ms: Optional[float] = Field(None, description="Total batch latency in milliseconds")
+
 class CacheSaveResponse(BaseModel):
     """Model for cache save responses"""
     message: str = Field(..., description="Status message")
     error: Optional[str] = Field(None, description="Error message if applicable")
 
+class BatchSaveResponse(BaseModel):
+    """Model for batch cache save responses"""
+    results: List[CacheSaveResponse] = Field(..., description="Per-entry results in request order")
+    saved: int = Field(..., description="Number of entries saved")
+    failed: int = Field(..., description="Number of entries that failed")
+    latency_ms: Optional[float] = Field(None, description="Total batch latency in milliseconds")
+
 class MetricsResponse(BaseModel):
     """Model for metrics response"""
     uptime_seconds: float = Field(..., description="Service uptime in seconds")
@@ -109,6 +109,12 @@ async def log_vector_search_metrics(
             f"hit={cache_hit}"
         )
 
+def log_embedding_cache_metrics(event: str, entries: int, size_bytes: int):
+    """Log embedding cache hit/miss/eviction counters and occupancy"""
+    metrics.increment_counter("embedding_cache_events", labels={"event": event})
+    metrics.set_gauge("embedding_cache_entries", entries)
+    metrics.set_gauge("embedding_cache_bytes", size_bytes)
+
 def get_metrics() -> Dict[str, Any]:
     """Get current metrics summary"""
     return metrics.get_metrics_summary()
\ No newline at end of file
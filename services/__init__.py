@@ -1,6 +1,7 @@
 import struct
 import numpy as np
 from bson import Binary, encode, decode
+from bson.binary import BinaryVectorDtype
 from enum import Enum
 from typing import List
 from utils.logger import logger
@@ -49,6 +50,46 @@ class AtlasBinDataVectorOptimizer:
             
         return Binary(binary, subtype=6)  # 6 = BSON-encoded document
     
+    @staticmethod
+    def encode_vector_atlas(
+        embedding: List[float],
+        vector_type: VectorType = VectorType.FLOAT32
+    ) -> Binary:
+        """Encode vectors as Atlas-indexable BSON vectors (BinData subtype 9)"""
+        
+        np_array = np.asarray(embedding, dtype=np.float32)
+        
+        if vector_type == VectorType.FLOAT32:
+            return Binary.from_vector(np_array.tolist(), BinaryVectorDtype.FLOAT32)
+            
+        elif vector_type == VectorType.INT8:
+            # Embeddings are unit-normalized, so components lie in [-1, 1]
+            quantized = np.clip(np.rint(np_array * 127), -128, 127).astype(np.int8)
+            return Binary.from_vector(quantized.tolist(), BinaryVectorDtype.INT8)
+            
+        elif vector_type == VectorType.BINARY:
+            packed = np.packbits(np_array > 0)
+            padding = (-len(np_array)) % 8
+            return Binary.from_vector(packed.tolist(), BinaryVectorDtype.PACKED_BIT, padding)
+            
+        raise ValueError(f"Unsupported Atlas vector type: {vector_type.value}")
+    
+    @staticmethod
+    def decode_vector_atlas(binary_data: Binary) -> List[float]:
+        """Decode BSON vectors (BinData subtype 9) back to float arrays"""
+        
+        vector = binary_data.as_vector()
+        
+        if vector.dtype == BinaryVectorDtype.INT8:
+            return (np.asarray(vector.data, dtype=np.float32) / 127).tolist()
+            
+        elif vector.dtype == BinaryVectorDtype.PACKED_BIT:
+            bits = np.unpackbits(np.asarray(vector.data, dtype=np.uint8))
+            bits = bits[:len(bits) - vector.padding]
+            return (bits.astype(np.float32) * 2 - 1).tolist()
+            
+        return list(vector.data)
+    
     @staticmethod
     def decode_vector_bindata(binary_data: Binary) -> List[float]:
         """Decode BinData vectors back to float arrays"""
@@ -1,26 +1,124 @@
+import asyncio
 import time
-from typing import Any, Dict
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
 
 import config
-from database.mongodb import get_mongodb_manager
+from database.storage import get_storage_backend
 from models.pydantic_models import CacheEntry, QueryRequest
 from monitoring.metrics import log_vector_search_metrics, metrics
-from services.embedding_service import get_embedding_service
+from services.candidate_policy import CandidatePolicy
+from services.embedding_service import EmbeddingOverloadedError, get_embedding_service
+from services.l1_cache import L1VectorCache
+from services.membership import UserMembership
+from services.save_queue import SaveQueue
 from utils.logger import logger
+from utils.text import query_hash
+
+
+class MissEmbeddingTable:
+    """Short-lived embeddings from missed lookups, keyed by (user_id, query hash)"""
+    
+    def __init__(
+        self,
+        ttl_seconds: int = config.MISS_EMBEDDING_TTL_SECONDS,
+        max_entries: int = config.MISS_EMBEDDING_MAX_ENTRIES
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+    
+    def put(self, user_id: str, query: str, embedding: List[float]):
+        """Remember the embedding computed for a lookup that missed"""
+        key = (user_id, query_hash(query))
+        self._entries.pop(key, None)
+        self._entries[key] = (time.time() + self.ttl_seconds, np.asarray(embedding, dtype=np.float32))
+        self._expire()
+    
+    def pop(self, user_id: str, query: str) -> Optional[List[float]]:
+        """Take the remembered embedding for a save of the same query"""
+        self._expire()
+        item = self._entries.pop((user_id, query_hash(query)), None)
+        return item[1].tolist() if item else None
+    
+    def _expire(self):
+        """Drop expired entries and enforce the size bound (oldest first)"""
+        now = time.time()
+        while self._entries:
+            _, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
 
 
 class CacheService:
     """semantic cache service"""
     
+    _instance = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CacheService, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+    
     def __init__(self):
-        self.mongodb = get_mongodb_manager()
+        if self._initialized:
+            return
+        
+        self.storage = get_storage_backend()
         self.embedding_service = get_embedding_service()
+        self.miss_embeddings = MissEmbeddingTable() if config.MISS_EMBEDDING_TTL_SECONDS > 0 else None
+        self.l1_cache = L1VectorCache() if config.L1_CACHE_ENABLED else None
+        self.candidate_policy = CandidatePolicy(self.storage) if config.ADAPTIVE_CANDIDATES_ENABLED else None
+        self.membership = UserMembership(self.storage) if config.USER_MEMBERSHIP_ENABLED else None
+        # Queued saves were already accepted and the queue bounds them, so they wait for the model
+        self.save_queue = (
+            SaveQueue(partial(self.save_to_cache_batch, reject_when_overloaded=False))
+            if config.ASYNC_SAVE_ENABLED else None
+        )
+        self._in_flight_lookups: Dict[Tuple[str, str, float], asyncio.Task] = {}
+        self._initialized = True
+    
+    async def start(self):
+        """Start background work - call this once at app startup"""
+        if self.membership is not None:
+            await self.membership.start()
+        if self.save_queue is not None:
+            self.save_queue.start()
+    
+    async def close(self):
+        """Stop background work, saving what is still queued"""
+        if self.save_queue is not None:
+            await self.save_queue.close(config.ASYNC_SAVE_SHUTDOWN_TIMEOUT_SECONDS)
+        if self.membership is not None:
+            await self.membership.close()
+    
+    def enqueue_save(self, entry: CacheEntry) -> bool:
+        """Queue an entry for a background batch save; False when the queue is full"""
+        return self.save_queue is not None and self.save_queue.enqueue(entry)
     
     async def save_to_cache(self, entry: CacheEntry) -> Dict[str, Any]:
         """Save entry to cache"""
         start_time = time.time()
         
         try:
+            # Refresh an entry with the same normalized query without embedding
+            if config.SAVE_DEDUP_MODE != "off":
+                duplicate = await self.storage.find_exact(
+                    entry.user_id,
+                    query_hash(entry.query),
+                    include_embedding=self.l1_cache is not None
+                )
+                if duplicate is not None:
+                    return await self._refresh_duplicate(entry, duplicate, "hash", start_time)
+            
+            # Reuse the embedding from a preceding missed lookup of the same query
+            self._reuse_miss_embedding(entry)
+            
             # Generate embedding if not provided
             if not entry.embedding:
                 entry.embedding = await self.embedding_service.generate_embedding(entry.query)
@@ -31,18 +129,27 @@ class CacheService:
                     "error": "Embedding generation failed"
                 }
             
-            # Prepare entry
-            entry_dict = entry.to_dict()
-            
-            # Add additional fields
-            entry_dict.update({
-                "embedding": entry.embedding
-            })
+            if config.SAVE_DEDUP_MODE == "similarity":
+                duplicate = await self.storage.vector_search(
+                    entry.user_id,
+                    entry.embedding,
+                    config.SAVE_DEDUP_THRESHOLD,
+                    include_embedding=self.l1_cache is not None
+                )
+                if duplicate is not None:
+                    return await self._refresh_duplicate(entry, duplicate, "similarity", start_time)
             
-            success = self.mongodb.insert_cache_entry(entry_dict)
+            doc = entry.to_dict()
+            success = await self.storage.insert_cache_entry(doc)
             save_time = (time.time() - start_time) * 1000
             
             if success:
+                if self.membership is not None:
+                    self.membership.record_save(entry.user_id, doc["timestamp"])
+                if self.l1_cache is not None:
+                    self.l1_cache.add(entry.user_id, entry.embedding, entry.response, doc["query_hash"])
+                if self.candidate_policy is not None:
+                    self.candidate_policy.record_inserts(entry.user_id)
                 metrics.record_histogram("cache_save_latency_ms", save_time)
                 logger.info(f"Saved to cache in {save_time:.2f}ms (user: {entry.user_id})")
                 return {"message": "Successfully saved to cache"}
@@ -60,13 +167,218 @@ class CacheService:
                 "error": str(e)
             }
     
+    async def save_to_cache_batch(
+        self,
+        entries: List[CacheEntry],
+        reject_when_overloaded: bool = True
+    ) -> Dict[str, Any]:
+        """Save several entries with one batched embedding call and one bulk insert"""
+        start_time = time.time()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(entries)
+        
+        try:
+            pending = list(range(len(entries)))
+            if config.SAVE_DEDUP_MODE != "off":
+                pending = await self._dedup_batch_by_hash(entries, pending, results, start_time)
+            
+            for i in pending:
+                if not entries[i].embedding:
+                    self._reuse_miss_embedding(entries[i])
+            
+            # Embed every entry still lacking a vector in one call
+            missing = [i for i in pending if not entries[i].embedding]
+            if missing:
+                embeddings = await self.embedding_service.generate_embeddings_batch(
+                    [entries[i].query for i in missing],
+                    reject_when_overloaded
+                )
+                for i, embedding in zip(missing, embeddings):
+                    entries[i].embedding = embedding
+            
+            ready = []
+            for i in pending:
+                if entries[i].embedding:
+                    ready.append(i)
+                else:
+                    results[i] = {
+                        "message": "Failed to save to cache",
+                        "error": "Embedding generation failed"
+                    }
+            
+            if config.SAVE_DEDUP_MODE == "similarity":
+                ready = await self._dedup_batch_by_similarity(entries, ready, results, start_time)
+            
+            docs = [entries[i].to_dict() for i in ready]
+            inserted = await self.storage.insert_cache_entries(docs)
+            for i, doc, success in zip(ready, docs, inserted):
+                if success:
+                    if self.membership is not None:
+                        self.membership.record_save(entries[i].user_id, doc["timestamp"])
+                    if self.l1_cache is not None:
+                        self.l1_cache.add(
+                            entries[i].user_id, entries[i].embedding, entries[i].response, doc["query_hash"]
+                        )
+                    if self.candidate_policy is not None:
+                        self.candidate_policy.record_inserts(entries[i].user_id)
+                    results[i] = {"message": "Successfully saved to cache"}
+                else:
+                    results[i] = {
+                        "message": "Failed to save to cache",
+                        "error": "Database insert failed"
+                    }
+            
+        except Exception as e:
+            logger.error(f"Batch cache save failed: {e}")
+            results = [
+                result or {"message": "Failed to save to cache", "error": str(e)}
+                for result in results
+            ]
+        
+        save_time = (time.time() - start_time) * 1000
+        saved = sum(1 for result in results if "error" not in result)
+        metrics.record_histogram("batch_save_latency_ms", save_time)
+        metrics.record_histogram("batch_save_size", len(entries))
+        logger.info(f"Saved {saved}/{len(entries)} entries to cache in {save_time:.2f}ms")
+        
+        return {
+            "results": results,
+            "saved": saved,
+            "failed": len(entries) - saved,
+            "latency_ms": save_time
+        }
+    
+    async def _dedup_batch_by_hash(
+        self,
+        entries: List[CacheEntry],
+        pending: List[int],
+        results: List[Optional[Dict[str, Any]]],
+        start_time: float
+    ) -> List[int]:
+        """Refresh stored entries with the same normalized query, returning the indexes left to save"""
+        # Within the batch the last entry for a normalized query wins
+        latest: Dict[Tuple[str, str], int] = {}
+        for i in pending:
+            latest[(entries[i].user_id, query_hash(entries[i].query))] = i
+        for i in pending:
+            if latest[(entries[i].user_id, query_hash(entries[i].query))] != i:
+                metrics.increment_counter("cache_dedup", labels={"match": "batch"})
+                results[i] = {"message": "Deduplicated within batch"}
+        
+        duplicates = await asyncio.gather(*(
+            self.storage.find_exact(user_id, hashed, include_embedding=self.l1_cache is not None)
+            for user_id, hashed in latest
+        ))
+        remaining = []
+        for i, duplicate in zip(latest.values(), duplicates):
+            if duplicate is None:
+                remaining.append(i)
+            else:
+                results[i] = await self._refresh_duplicate(entries[i], duplicate, "hash", start_time)
+        return sorted(remaining)
+    
+    async def _dedup_batch_by_similarity(
+        self,
+        entries: List[CacheEntry],
+        ready: List[int],
+        results: List[Optional[Dict[str, Any]]],
+        start_time: float
+    ) -> List[int]:
+        """Refresh stored near-duplicates of embedded entries, returning the indexes left to insert"""
+        duplicates = await asyncio.gather(*(
+            self.storage.vector_search(
+                entries[i].user_id,
+                entries[i].embedding,
+                config.SAVE_DEDUP_THRESHOLD,
+                include_embedding=self.l1_cache is not None
+            )
+            for i in ready
+        ))
+        remaining = []
+        for i, duplicate in zip(ready, duplicates):
+            if duplicate is None:
+                remaining.append(i)
+            else:
+                results[i] = await self._refresh_duplicate(entries[i], duplicate, "similarity", start_time)
+        return remaining
+    
+    async def _refresh_duplicate(
+        self,
+        entry: CacheEntry,
+        duplicate: Dict[str, Any],
+        match: str,
+        start_time: float
+    ) -> Dict[str, Any]:
+        """Point an existing entry at the new response instead of inserting a copy"""
+        fields = entry.to_dict()
+        updated = await self.storage.update_cache_entry(
+            entry.user_id,
+            duplicate["_id"],
+            {"response": fields["response"], "timestamp": fields["timestamp"]}
+        )
+        save_time = (time.time() - start_time) * 1000
+        
+        if not updated:
+            return {
+                "message": "Failed to save to cache",
+                "error": "Database update failed"
+            }
+        
+        # Refresh the duplicate's own L1 row (same vector and hash) rather than adding the new query
+        self._add_to_l1(entry.user_id, {**duplicate, "response": entry.response})
+        if self.membership is not None:
+            self.membership.record_save(entry.user_id, fields["timestamp"])
+        metrics.increment_counter("cache_dedup", labels={"match": match})
+        metrics.record_histogram("cache_save_latency_ms", save_time)
+        logger.info(f"Refreshed existing cache entry ({match} match) in {save_time:.2f}ms (user: {entry.user_id})")
+        return {"message": "Updated existing cache entry"}
+    
+    def _reuse_miss_embedding(self, entry: CacheEntry):
+        """Take the embedding remembered from a missed lookup of the same query"""
+        if entry.embedding or self.miss_embeddings is None:
+            return
+        
+        entry.embedding = self.miss_embeddings.pop(entry.user_id, entry.query)
+        metrics.increment_counter(
+            "miss_embedding_reuse",
+            labels={"result": "hit" if entry.embedding else "miss"}
+        )
+    
     async def lookup_cache(self, request: QueryRequest) -> Dict[str, Any]:
+        """Look up cache entry, sharing the work of identical concurrent lookups"""
+        # Use provided threshold or default
+        threshold = request.threshold if request.threshold is not None else config.SIMILARITY_THRESHOLD
+        
+        if not config.LOOKUP_SINGLE_FLIGHT_ENABLED:
+            return await self._lookup(request, threshold)
+        
+        start_time = time.time()
+        key = (request.user_id, query_hash(request.query), threshold)
+        task = self._in_flight_lookups.get(key)
+        
+        if task is None:
+            task = asyncio.ensure_future(self._lookup(request, threshold))
+            self._in_flight_lookups[key] = task
+            task.add_done_callback(lambda _: self._in_flight_lookups.pop(key, None))
+            # Shield so a cancelled caller doesn't cancel the lookup for the others
+            return dict(await asyncio.shield(task))
+        
+        metrics.increment_counter("lookup_coalesced")
+        result = dict(await asyncio.shield(task))
+        result["latency_ms"] = (time.time() - start_time) * 1000
+        return result
+    
+    async def _lookup(self, request: QueryRequest, threshold: float) -> Dict[str, Any]:
         """Look up cache entry"""
         start_time = time.time()
         
         try:
-            # Use provided threshold or default
-            threshold = request.threshold if request.threshold is not None else config.SIMILARITY_THRESHOLD
+            result = await self._skip_unknown_user(request, start_time)
+            if result:
+                return result
+            
+            result = await self._exact_lookup(request, start_time)
+            if result:
+                return result
             
             # Generate embedding
             embedding = await self.embedding_service.generate_embedding(request.query)
@@ -76,44 +388,10 @@ class CacheService:
                     "error": "Embedding generation failed"
                 }
             
-            # Perform vector search
-            result = await self.mongodb.vector_search(
-                user_id=request.user_id,
-                embedding=embedding,
-                threshold=threshold
-            )
+            return await self._search(request, threshold, embedding, start_time)
             
-            total_time = (time.time() - start_time) * 1000
-            
-            if result:
-                # Log metrics
-                await log_vector_search_metrics(
-                    user_id=request.user_id,
-                    latency_ms=total_time,
-                    num_candidates=config.DEFAULT_NUM_CANDIDATES,
-                    result_score=result.get("vector_score", 0),
-                    cache_hit=True
-                )
-                
-                return {
-                    "response": result["response"],
-                    "latency_ms": total_time,
-                    "similarity_score": result.get("vector_score", 0)
-                }
-            
-            # Log cache miss
-            await log_vector_search_metrics(
-                user_id=request.user_id,
-                latency_ms=total_time,
-                num_candidates=config.DEFAULT_NUM_CANDIDATES,
-                result_score=0,
-                cache_hit=False
-            )
-            
-            return {
-                "response": "cache_miss",
-                "latency_ms": total_time
-            }
+        except EmbeddingOverloadedError as e:
+            return self._overloaded_miss(e, start_time)
             
         except Exception as e:
             total_time = (time.time() - start_time) * 1000
@@ -124,14 +402,223 @@ class CacheService:
                 "latency_ms": total_time
             }
     
+    async def lookup_cache_batch(self, requests: List[QueryRequest]) -> Dict[str, Any]:
+        """Look up several queries with one batched embedding call"""
+        start_time = time.time()
+        thresholds = [
+            request.threshold if request.threshold is not None else config.SIMILARITY_THRESHOLD
+            for request in requests
+        ]
+        
+        def failed(error: Exception) -> Dict[str, Any]:
+            logger.error(f"Batch cache lookup item failed: {error}")
+            return {
+                "response": "",
+                "error": str(error),
+                "latency_ms": (time.time() - start_time) * 1000
+            }
+        
+        # Users without entries miss outright; everyone else tries the exact-match fast path first
+        results: List[Optional[Dict[str, Any]]] = list(await asyncio.gather(
+            *(self._skip_unknown_user(request, start_time) for request in requests)
+        ))
+        known = [i for i, result in enumerate(results) if result is None]
+        exact = await asyncio.gather(
+            *(self._exact_lookup(requests[i], start_time) for i in known),
+            return_exceptions=True
+        )
+        for i, result in zip(known, exact):
+            results[i] = failed(result) if isinstance(result, Exception) else result
+        pending = [i for i, result in enumerate(results) if result is None]
+        
+        if pending:
+            try:
+                embeddings = await self.embedding_service.generate_embeddings_batch(
+                    [requests[i].query for i in pending]
+                )
+            except EmbeddingOverloadedError as e:
+                for i in pending:
+                    results[i] = self._overloaded_miss(e, start_time)
+                pending, embeddings = [], []
+            if len(embeddings) != len(pending):
+                embeddings = [[] for _ in pending]
+            
+            async def search(i: int, embedding: List[float]) -> Dict[str, Any]:
+                if not embedding:
+                    return {
+                        "response": "",
+                        "error": "Embedding generation failed"
+                    }
+                return await self._search(requests[i], thresholds[i], embedding, start_time)
+            
+            searched = await asyncio.gather(
+                *(search(i, embedding) for i, embedding in zip(pending, embeddings)),
+                return_exceptions=True
+            )
+            for i, result in zip(pending, searched):
+                results[i] = failed(result) if isinstance(result, Exception) else result
+        
+        total_time = (time.time() - start_time) * 1000
+        metrics.record_histogram("batch_lookup_latency_ms", total_time)
+        metrics.record_histogram("batch_lookup_size", len(requests))
+        
+        return {
+            "results": results,
+            "latency_ms": total_time
+        }
+    
+    def _overloaded_miss(self, error: EmbeddingOverloadedError, start_time: float) -> Dict[str, Any]:
+        """Degrade a lookup to cache_miss while the embedding model is saturated"""
+        total_time = (time.time() - start_time) * 1000
+        metrics.increment_counter("lookup_overloaded")
+        logger.warning(f"Cache lookup degraded to a miss: {error}")
+        return {
+            "response": "cache_miss",
+            "latency_ms": total_time
+        }
+    
+    async def _skip_unknown_user(self, request: QueryRequest, start_time: float) -> Optional[Dict[str, Any]]:
+        """Miss without embedding or searching when the user has no live entries"""
+        if self.membership is None or self.membership.might_have_entries(request.user_id):
+            return None
+        
+        total_time = (time.time() - start_time) * 1000
+        metrics.increment_counter("user_membership_skips")
+        await log_vector_search_metrics(
+            user_id=request.user_id,
+            latency_ms=total_time,
+            num_candidates=0,
+            result_score=0,
+            cache_hit=False
+        )
+        
+        return {
+            "response": "cache_miss",
+            "latency_ms": total_time
+        }
+    
+    async def _exact_lookup(self, request: QueryRequest, start_time: float) -> Optional[Dict[str, Any]]:
+        """Exact-match fast path: L1 or indexed point lookup before any embedding work"""
+        if not config.EXACT_MATCH_ENABLED:
+            return None
+        
+        normalized_hash = query_hash(request.query)
+        if self.l1_cache is not None:
+            result = self.l1_cache.find_exact(request.user_id, normalized_hash)
+            if result:
+                return await self._cache_hit(request, result["response"], 1.0, 0, start_time)
+        
+        result = await self.storage.find_exact(
+            request.user_id,
+            normalized_hash,
+            include_embedding=self.l1_cache is not None
+        )
+        if result:
+            self._add_to_l1(request.user_id, result)
+            return await self._cache_hit(request, result["response"], 1.0, 0, start_time)
+        return None
+    
+    def _add_to_l1(self, user_id: str, result: Dict[str, Any]):
+        """Cache a stored entry returned by the backend under its own vector and query hash"""
+        if self.l1_cache is not None and result.get("embedding"):
+            self.l1_cache.add(user_id, result["embedding"], result["response"], result.get("query_hash"))
+    
+    async def _search(
+        self,
+        request: QueryRequest,
+        threshold: float,
+        embedding: List[float],
+        start_time: float
+    ) -> Dict[str, Any]:
+        """Search the L1 tier, then the storage backend, for an embedded query"""
+        # In-process L1 tier before the Atlas round-trip
+        if self.l1_cache is not None:
+            result = self.l1_cache.search(request.user_id, embedding, threshold)
+            if result:
+                return await self._cache_hit(request, result["response"], result["vector_score"], 0, start_time)
+        
+        num_candidates, exact = config.DEFAULT_NUM_CANDIDATES, False
+        if self.candidate_policy is not None:
+            num_candidates, exact = await self.candidate_policy.choose(request.user_id)
+        
+        # Perform vector search
+        result = await self.storage.vector_search(
+            user_id=request.user_id,
+            embedding=embedding,
+            threshold=threshold,
+            num_candidates=num_candidates,
+            exact=exact,
+            include_embedding=self.l1_cache is not None
+        )
+        
+        if result:
+            # The matched entry's vector, not the query's, so L1 never accepts what Atlas would reject
+            self._add_to_l1(request.user_id, result)
+            return await self._cache_hit(
+                request,
+                result["response"],
+                result.get("vector_score", 0),
+                num_candidates,
+                start_time
+            )
+        
+        total_time = (time.time() - start_time) * 1000
+        
+        # Keep the embedding for the save that usually follows a miss
+        if self.miss_embeddings is not None:
+            self.miss_embeddings.put(request.user_id, request.query, embedding)
+        
+        # Log cache miss
+        await log_vector_search_metrics(
+            user_id=request.user_id,
+            latency_ms=total_time,
+            num_candidates=num_candidates,
+            result_score=0,
+            cache_hit=False
+        )
+        
+        return {
+            "response": "cache_miss",
+            "latency_ms": total_time
+        }
+    
+    async def _cache_hit(
+        self,
+        request: QueryRequest,
+        response: str,
+        score: float,
+        num_candidates: int,
+        start_time: float
+    ) -> Dict[str, Any]:
+        """Log metrics for a cache hit and build its response"""
+        total_time = (time.time() - start_time) * 1000
+        
+        await log_vector_search_metrics(
+            user_id=request.user_id,
+            latency_ms=total_time,
+            num_candidates=num_candidates,
+            result_score=score,
+            cache_hit=True
+        )
+        
+        return {
+            "response": response,
+            "latency_ms": total_time,
+            "similarity_score": score
+        }
+    
     def get_service_info(self) -> Dict[str, Any]:
         """Get service information"""
         return {
             "embedding_model": config.EMBEDDING_MODEL,
             "embedding_dimensions": config.EMBEDDING_DIMENSIONS,
-            "default_similarity_threshold": config.SIMILARITY_THRESHOLD
+            "embedding_backend": config.EMBEDDING_BACKEND,
+            "embedding_quantization": config.EMBEDDING_QUANTIZATION,
+            "embedding_quantization_report": self.embedding_service.quantization_report,
+            "default_similarity_threshold": config.SIMILARITY_THRESHOLD,
+            "storage_backend": config.STORAGE_BACKEND
         }
 
 def get_cache_service() -> CacheService:
-    """Get cache service instance"""
+    """Get singleton cache service instance"""
     return CacheService()
\ No newline at end of file
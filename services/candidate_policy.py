@@ -0,0 +1,72 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import config
+from database.storage import StorageBackend
+from monitoring.metrics import metrics
+
+
+class CandidatePolicy:
+    """Picks numCandidates, or exact search, from cached per-user entry counts"""
+    
+    def __init__(
+        self,
+        storage: StorageBackend,
+        exact_max_entries: int = config.ADAPTIVE_EXACT_MAX_ENTRIES,
+        min_candidates: int = config.ADAPTIVE_MIN_NUM_CANDIDATES,
+        max_candidates: int = config.DEFAULT_NUM_CANDIDATES,
+        candidate_ratio: float = config.ADAPTIVE_CANDIDATE_RATIO,
+        refresh_seconds: int = config.ADAPTIVE_COUNT_REFRESH_SECONDS,
+        max_users: int = config.ADAPTIVE_COUNT_MAX_USERS
+    ):
+        self.storage = storage
+        self.exact_max_entries = exact_max_entries
+        # numCandidates must be at least the $vectorSearch limit
+        self.min_candidates = max(min_candidates, config.MAX_QUERY_LIMIT)
+        self.max_candidates = max(max_candidates, self.min_candidates)
+        self.candidate_ratio = candidate_ratio
+        self.refresh_seconds = refresh_seconds
+        self.max_users = max_users
+        self._counts: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+    
+    async def choose(self, user_id: str) -> Tuple[int, bool]:
+        """Return (numCandidates, exact) for a search over the user's entries"""
+        count = await self.count(user_id)
+        if count is None:
+            return self.max_candidates, False
+        
+        if count <= self.exact_max_entries:
+            # Exact search scores every entry, which is cheap for small users
+            metrics.increment_counter("adaptive_candidates_total", labels={"mode": "exact"})
+            return count, True
+        
+        metrics.increment_counter("adaptive_candidates_total", labels={"mode": "ann"})
+        num_candidates = math.ceil(count * self.candidate_ratio)
+        return min(self.max_candidates, max(self.min_candidates, num_candidates)), False
+    
+    async def count(self, user_id: str) -> Optional[int]:
+        """The user's entry count, recounted once it is older than refresh_seconds"""
+        cached = self._counts.get(user_id)
+        if cached is not None and time.time() - cached[1] < self.refresh_seconds:
+            self._counts.move_to_end(user_id)
+            return cached[0]
+        
+        # The periodic recount is what picks up entries removed by the TTL index
+        count = await self.storage.count_entries(user_id)
+        if count is None:
+            return None
+        self._counts[user_id] = (count, time.time())
+        self._counts.move_to_end(user_id)
+        while len(self._counts) > self.max_users:
+            self._counts.popitem(last=False)
+        
+        metrics.increment_counter("adaptive_count_refreshes")
+        return count
+    
+    def record_inserts(self, user_id: str, inserted: int = 1):
+        """Keep a cached count current after saves without recounting"""
+        cached = self._counts.get(user_id)
+        if cached is not None:
+            self._counts[user_id] = (cached[0] + inserted, cached[1])
@@ -1,11 +1,25 @@
 import asyncio
-from typing import List
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
+import numpy as np
 import torch
 from sentence_transformers import SentenceTransformer
 
 import config
+from monitoring.metrics import log_embedding_cache_metrics, metrics
+from services.embedding_workers import EmbeddingProcessPool
+from services.quantization import (
+    ONNX_INT8_FILE, load_calibration_queries, measure_drift, quantize_dynamic_int8
+)
 from utils.logger import logger
+from utils.text import query_hash
+
+class EmbeddingOverloadedError(RuntimeError):
+    """Raised when accepting more texts would exceed EMBEDDING_MAX_QUEUE_DEPTH"""
+
 
 def get_device():
     """Auto-detect the best available device"""
@@ -21,11 +35,164 @@ def get_device():
         print("Using CPU")
     return device
 
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text encode requests into batched model calls"""
+    
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], Awaitable[np.ndarray]],
+        max_batch_size: int = config.EMBEDDING_BATCH_MAX_SIZE,
+        max_wait_ms: float = config.EMBEDDING_BATCH_MAX_WAIT_MS,
+        max_concurrent_batches: int = 1
+    ):
+        self._encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+    
+    def _ensure_worker(self):
+        """Start the batching worker on the running event loop"""
+        loop = asyncio.get_event_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = loop.create_task(self._run())
+    
+    async def submit(self, text: str) -> np.ndarray:
+        """Queue a text and wait for its embedding"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+    
+    async def close(self):
+        """Stop the batching worker and any batches still encoding"""
+        for task in [self._worker, *self._in_flight]:
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._worker = None
+        self._in_flight.clear()
+    
+    async def _run(self):
+        """Collect queued texts into batches and encode up to max_concurrent_batches at once"""
+        while True:
+            batch = [await self._queue.get()]
+            
+            # While every slot is busy, texts keep queueing up for a fuller batch
+            await self._slots.acquire()
+            
+            # Give concurrent callers a short window to join the batch
+            if self._queue.qsize() < self.max_batch_size - 1 and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+            
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            
+            task = self._loop.create_task(self._encode_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._batch_done)
+    
+    def _batch_done(self, task: asyncio.Task):
+        """Free the slot of a finished batch"""
+        self._in_flight.discard(task)
+        self._slots.release()
+    
+    async def _encode_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Encode one batch and resolve each caller's future"""
+        start_time = time.time()
+        texts = [text for text, _ in batch]
+        
+        try:
+            vectors = await self._encode_fn(texts)
+        except Exception as e:
+            logger.error(f"Batched embedding of {len(texts)} texts failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        batch_time = (time.time() - start_time) * 1000
+        metrics.record_histogram("embedding_batch_size", len(texts))
+        metrics.record_histogram("embedding_batch_latency_ms", batch_time)
+        
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+
+class EmbeddingCache:
+    """LRU of float32 embeddings keyed by a hash of the normalized query text"""
+    
+    # Approximate per-entry bookkeeping cost (hash key, dict node, array header)
+    ENTRY_OVERHEAD_BYTES = 300
+    
+    def __init__(
+        self,
+        max_entries: int = config.EMBEDDING_CACHE_MAX_ENTRIES,
+        max_bytes: int = int(config.EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for text, if any"""
+        key = query_hash(text)
+        vector = self._entries.get(key)
+        if vector is None:
+            log_embedding_cache_metrics("miss", len(self._entries), self.size_bytes)
+            return None
+        
+        self._entries.move_to_end(key)
+        log_embedding_cache_metrics("hit", len(self._entries), self.size_bytes)
+        return vector
+    
+    def put(self, text: str, vector: np.ndarray):
+        """Store an embedding, evicting least recently used entries as needed"""
+        key = query_hash(text)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        
+        stored = np.array(vector, dtype=np.float32)
+        stored.setflags(write=False)
+        self._entries[key] = stored
+        self.size_bytes += stored.nbytes + self.ENTRY_OVERHEAD_BYTES
+        
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self.size_bytes -= evicted.nbytes + self.ENTRY_OVERHEAD_BYTES
+            log_embedding_cache_metrics("eviction", len(self._entries), self.size_bytes)
+
+
 class EmbeddingService:
     """Embedding service using all-MiniLM-L6-v2 model"""
     
     _instance = None
     _model = None
+    _batcher = None
+    _cache = None
+    _pool = None
+    _executor = None
+    _pending = 0
+    quantization_report: Optional[Dict[str, float]] = None
     
     def __new__(cls):
         if cls._instance is None:
@@ -33,67 +200,244 @@ class EmbeddingService:
         return cls._instance
     
     def __init__(self):
-        if self._model is None:
-            self._load_model()
+        if self._model is None and self._pool is None:
+            if config.EMBEDDING_WORKER_PROCESSES > 0:
+                # The model lives in the worker processes only
+                self._pool = EmbeddingProcessPool()
+                self._pool.warm_up()
+            else:
+                self._load_model()
+                # Dedicated bounded executor instead of the shared default thread pool
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, config.EMBEDDING_EXECUTOR_WORKERS),
+                    thread_name_prefix="embedding"
+                )
+        if self._batcher is None and config.EMBEDDING_BATCH_ENABLED:
+            self._batcher = EmbeddingBatcher(
+                self._encode_async,
+                max_concurrent_batches=config.EMBEDDING_WORKER_PROCESSES or config.EMBEDDING_EXECUTOR_WORKERS
+            )
+        if self._cache is None and config.EMBEDDING_CACHE_ENABLED:
+            self._cache = EmbeddingCache()
     
     def _load_model(self):
-        """Load the all-MiniLM-L6-v2 model"""
+        """Load the all-MiniLM-L6-v2 model on the configured backend"""
         try:
-            logger.info(f"Loading embedding model: {config.EMBEDDING_MODEL}")
-            # Auto-detect device
-            device = get_device()
-            print(f"Using device: {device}")
-            self._model = SentenceTransformer(config.EMBEDDING_MODEL, device=device)
-            logger.info(f"Model loaded successfully. Dimension: {self._model.get_sentence_embedding_dimension()}")
+            logger.info(f"Loading embedding model: {config.EMBEDDING_MODEL} ({config.EMBEDDING_BACKEND} backend)")
+            if config.EMBEDDING_TORCH_THREADS > 0:
+                torch.set_num_threads(config.EMBEDDING_TORCH_THREADS)
+            int8 = config.EMBEDDING_QUANTIZATION == "int8"
+            if config.EMBEDDING_BACKEND == "onnx":
+                # ONNX Runtime on CPU; exports the model on the fly if the repo has no ONNX file
+                model_kwargs = {"provider": "CPUExecutionProvider"}
+                onnx_file = config.EMBEDDING_ONNX_FILE or (ONNX_INT8_FILE if int8 else "")
+                if onnx_file:
+                    model_kwargs["file_name"] = onnx_file
+                self._model = SentenceTransformer(
+                    config.EMBEDDING_MODEL,
+                    device="cpu",
+                    backend="onnx",
+                    model_kwargs=model_kwargs
+                )
+                self._model.max_seq_length = config.EMBEDDING_MAX_SEQ_LENGTH
+                if int8 and config.EMBEDDING_QUANTIZATION_CHECK:
+                    reference = SentenceTransformer(config.EMBEDDING_MODEL, device="cpu")
+                    reference.max_seq_length = config.EMBEDDING_MAX_SEQ_LENGTH
+                    texts = load_calibration_queries()
+                    self.quantization_report = measure_drift(
+                        reference.encode(texts, convert_to_numpy=True, normalize_embeddings=True),
+                        self._encode(texts)
+                    )
+            elif config.EMBEDDING_BACKEND == "torch":
+                # Auto-detect device (dynamic quantization runs on CPU only)
+                device = "cpu" if int8 else get_device()
+                print(f"Using device: {device}")
+                self._model = SentenceTransformer(config.EMBEDDING_MODEL, device=device)
+                self._model.max_seq_length = config.EMBEDDING_MAX_SEQ_LENGTH
+                if int8:
+                    texts = load_calibration_queries() if config.EMBEDDING_QUANTIZATION_CHECK else []
+                    reference = self._encode(texts) if texts else None
+                    self._model = quantize_dynamic_int8(self._model)
+                    if reference is not None:
+                        self.quantization_report = measure_drift(reference, self._encode(texts))
+            else:
+                raise ValueError(f"Unknown EMBEDDING_BACKEND: {config.EMBEDDING_BACKEND}")
+            logger.info(
+                f"Model loaded successfully. Dimension: {self._model.get_sentence_embedding_dimension()}, "
+                f"quantization: {config.EMBEDDING_QUANTIZATION}"
+            )
         except Exception as e:
             logger.error(f"Failed to load embedding model: {e}")
             raise
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode a list of texts into unit vectors, bucketed by token count"""
+        batch_size = max(1, config.EMBEDDING_ENCODE_BATCH_SIZE)
+        # A single bucket would be padded exactly like a plain encode, so skip the extra tokenization
+        if not config.EMBEDDING_LENGTH_BUCKETING or len(texts) <= batch_size:
+            return self._model.encode(
+                texts,
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+        
+        # encode() pads each batch to its longest member and only sorts by character
+        # count, so group texts by their real token count and encode each group alone
+        lengths = np.array([
+            len(ids) for ids in self._model.tokenizer(
+                texts, truncation=True, max_length=self._model.max_seq_length
+            )["input_ids"]
+        ])
+        order = np.argsort(lengths, kind="stable")
+        
+        vectors: Optional[np.ndarray] = None
+        padded_tokens = 0
+        for start in range(0, len(texts), batch_size):
+            bucket = order[start:start + batch_size]
+            encoded = self._model.encode(
+                [texts[i] for i in bucket],
+                batch_size=len(bucket),
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+            if vectors is None:
+                vectors = np.empty((len(texts), encoded.shape[1]), dtype=encoded.dtype)
+            # Write each bucket back to the original positions
+            vectors[bucket] = encoded
+            padded_tokens += len(bucket) * int(lengths[bucket].max())
+        
+        metrics.record_histogram("embedding_padding_ratio", float(1 - lengths.sum() / padded_tokens))
+        return vectors
+    
+    async def _encode_async(self, texts: List[str]) -> np.ndarray:
+        """Encode texts off the event loop, in a worker process or the default thread pool"""
+        if self._pool is not None:
+            return await self._pool.encode(texts)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, self._encode_timed, texts, time.time())
+    
+    def _encode_timed(self, texts: List[str], submitted_at: float) -> np.ndarray:
+        """Encode on an executor thread, recording how long the job waited for it"""
+        metrics.record_histogram("embedding_queue_wait_ms", (time.time() - submitted_at) * 1000)
+        return self._encode(texts)
+    
+    def _admit(self, count: int, reject_when_overloaded: bool = True):
+        """Reserve room for texts about to be encoded, failing fast when the queue is full"""
+        # An idle service always admits, however large the request
+        if (
+            reject_when_overloaded
+            and self._pending
+            and self._pending + count > config.EMBEDDING_MAX_QUEUE_DEPTH > 0
+        ):
+            metrics.increment_counter("embedding_overload_rejections", value=count)
+            raise EmbeddingOverloadedError(
+                f"{self._pending} texts already waiting for the embedding model"
+            )
+        self._pending += count
+        metrics.set_gauge("embedding_queue_depth", self._pending)
+    
+    def _release(self, count: int):
+        """Free the room reserved by _admit"""
+        self._pending -= count
+        metrics.set_gauge("embedding_queue_depth", self._pending)
    
     async def generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for text"""
+        """Generate embedding for text; raises EmbeddingOverloadedError when overloaded"""
         try:
             if not text or not text.strip():
                 logger.error("Empty text provided for embedding")
                 return []
             
-            # Run in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
-                None, 
-                lambda: self._model.encode(text, convert_to_numpy=True).tolist()
-            )
+            if self._cache is not None:
+                cached = self._cache.get(text)
+                if cached is not None:
+                    return cached.tolist()
+            
+            self._admit(1)
+            try:
+                if self._batcher is not None:
+                    # Coalesce with other in-flight requests
+                    vector = await self._batcher.submit(text)
+                else:
+                    vector = (await self._encode_async([text]))[0]
+            finally:
+                self._release(1)
+            
+            if self._cache is not None:
+                self._cache.put(text, vector)
+            embedding = vector.tolist()
             
             logger.debug(f"Generated embedding of dimension {len(embedding)} for text: {text[:50]}...")
             return embedding
             
+        except EmbeddingOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Failed to generate embedding: {e}")
             return []
     
-    async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts"""
+    async def generate_embeddings_batch(
+        self,
+        texts: List[str],
+        reject_when_overloaded: bool = True
+    ) -> List[List[float]]:
+        """Generate embeddings for multiple texts, aligned with the input order
+        
+        Empty texts get an empty embedding in their position. Raises
+        EmbeddingOverloadedError when the embedding queue is full, unless
+        reject_when_overloaded is False (background work bounded elsewhere),
+        in which case the texts always queue for the model.
+        """
         try:
             if not texts:
                 return []
             
-            # Filter out empty texts
-            valid_texts = [text for text in texts if text and text.strip()]
+            # Encode only non-empty texts
+            valid_positions = [i for i, text in enumerate(texts) if text and text.strip()]
+            valid_texts = [texts[i] for i in valid_positions]
             if not valid_texts:
-                return []
+                return [[] for _ in texts]
             
-            # Run in thread pool
-            loop = asyncio.get_event_loop()
-            embeddings = await loop.run_in_executor(
-                None,
-                lambda: self._model.encode(valid_texts, convert_to_numpy=True).tolist()
-            )
+            # Serve repeated texts from the cache and encode only the rest
+            vectors: List[Optional[np.ndarray]] = [
+                self._cache.get(text) if self._cache is not None else None
+                for text in valid_texts
+            ]
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            
+            if missing:
+                self._admit(len(missing), reject_when_overloaded)
+                try:
+                    encoded = await self._encode_async([valid_texts[i] for i in missing])
+                finally:
+                    self._release(len(missing))
+                for i, vector in zip(missing, encoded):
+                    vectors[i] = vector
+                    if self._cache is not None:
+                        self._cache.put(valid_texts[i], vector)
+            
+            embeddings: List[List[float]] = [[] for _ in texts]
+            for position, vector in zip(valid_positions, vectors):
+                embeddings[position] = vector.tolist()
             
-            logger.info(f"Generated {len(embeddings)} embeddings for batch of {len(valid_texts)} texts")
+            logger.info(f"Generated {len(valid_texts)} embeddings for batch of {len(texts)} texts")
             return embeddings
             
+        except EmbeddingOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Failed to generate batch embeddings: {e}")
             return []
+    
+    async def close(self):
+        """Stop background batching and worker processes"""
+        if self._batcher is not None:
+            await self._batcher.close()
+        if self._pool is not None:
+            self._pool.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
 
 
 def get_embedding_service() -> EmbeddingService:
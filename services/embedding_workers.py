@@ -0,0 +1,91 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List
+
+import numpy as np
+
+import config
+from monitoring.metrics import metrics
+from utils.logger import logger
+
+
+def init_worker(num_threads: int):
+    """Load the embedding model once per worker process with a pinned torch thread count"""
+    from services.embedding_service import get_embedding_service
+    
+    # Workers encode in-process rather than starting pools of their own
+    config.EMBEDDING_WORKER_PROCESSES = 0
+    config.EMBEDDING_TORCH_THREADS = num_threads
+    get_embedding_service()
+
+
+def encode_in_worker(texts: List[str]) -> bytes:
+    """Encode texts inside a worker process, returning a raw float32 buffer"""
+    from services.embedding_service import get_embedding_service
+    
+    return get_embedding_service()._encode(texts).astype(np.float32, copy=False).tobytes()
+
+
+class EmbeddingProcessPool:
+    """Embedding model replicas in worker processes, outside the API process's GIL"""
+    
+    def __init__(
+        self,
+        num_processes: int = config.EMBEDDING_WORKER_PROCESSES,
+        threads_per_process: int = config.EMBEDDING_WORKER_THREADS
+    ):
+        self.num_processes = max(1, num_processes)
+        if threads_per_process <= 0:
+            threads_per_process = max(1, (os.cpu_count() or 1) // self.num_processes)
+        self.threads_per_process = threads_per_process
+        self._restart_lock = asyncio.Lock()
+        self._executor = self._start_executor()
+    
+    def _start_executor(self) -> ProcessPoolExecutor:
+        """Start a fresh set of worker processes"""
+        logger.info(
+            f"Starting {self.num_processes} embedding worker processes "
+            f"({self.threads_per_process} torch threads each)"
+        )
+        return ProcessPoolExecutor(
+            max_workers=self.num_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.threads_per_process,)
+        )
+    
+    def warm_up(self):
+        """Start every worker and load its model before the first request"""
+        futures = [self._executor.submit(encode_in_worker, ["warm up"]) for _ in range(self.num_processes)]
+        for future in futures:
+            future.result()
+    
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts in a worker process into a (len(texts), dimensions) float32 matrix"""
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            buffer = await loop.run_in_executor(executor, encode_in_worker, texts)
+        except BrokenProcessPool:
+            # A worker died (OOM kill, segfault); replace the pool and retry once
+            await self._restart(executor)
+            buffer = await loop.run_in_executor(self._executor, encode_in_worker, texts)
+        return np.frombuffer(buffer, dtype=np.float32).reshape(len(texts), -1)
+    
+    async def _restart(self, broken: ProcessPoolExecutor):
+        """Replace a broken pool with a warmed-up one, once however many callers saw it break"""
+        async with self._restart_lock:
+            if self._executor is not broken:
+                return
+            logger.error("Embedding worker process died; restarting the worker pool")
+            metrics.increment_counter("embedding_worker_restarts")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._start_executor()
+            await asyncio.get_running_loop().run_in_executor(None, self.warm_up)
+    
+    def close(self):
+        """Stop the worker processes"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,162 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import config
+from monitoring.metrics import metrics
+from utils.vectors import similarity_scores, to_unit_vector
+
+
+class _UserVectors:
+    """Ring buffer of one user's cached vectors in a contiguous float32 matrix"""
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.matrix = np.empty((0, config.EMBEDDING_DIMENSIONS), dtype=np.float32)
+        self.expires_at = np.empty(0, dtype=np.float64)
+        self.responses: List[str] = []
+        self.query_hashes: List[Optional[str]] = []
+        self.slots_by_hash: Dict[str, int] = {}
+        self.next_slot = 0
+    
+    def __len__(self) -> int:
+        return len(self.responses)
+    
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Similarity of every live row to the query (expired rows score -inf)"""
+        count = len(self.responses)
+        scores = similarity_scores(self.matrix[:count], query)
+        scores[self.expires_at[:count] <= time.time()] = -np.inf
+        return scores
+    
+    def find_exact(self, query_hash: str) -> Optional[int]:
+        """Live row cached under a normalized query hash"""
+        slot = self.slots_by_hash.get(query_hash)
+        if slot is None or self.expires_at[slot] <= time.time():
+            return None
+        return slot
+    
+    def put(self, vector: np.ndarray, response: str, expires_at: float, query_hash: Optional[str]):
+        """Add a vector, overwriting the oldest row once at capacity"""
+        if len(self.responses) < self.capacity:
+            # Grow geometrically so small users stay small
+            if len(self.responses) == len(self.matrix):
+                new_size = min(self.capacity, max(8, 2 * len(self.matrix)))
+                self.matrix = np.resize(self.matrix, (new_size, self.matrix.shape[1]))
+                self.expires_at = np.resize(self.expires_at, new_size)
+            slot = len(self.responses)
+            self.responses.append(response)
+            self.query_hashes.append(None)
+        else:
+            slot = self.next_slot
+            self.next_slot = (slot + 1) % self.capacity
+            self.responses[slot] = response
+        
+        self.matrix[slot] = vector
+        self.expires_at[slot] = expires_at
+        self._set_hash(slot, query_hash)
+    
+    def update(self, slot: int, response: str, expires_at: float, query_hash: Optional[str]):
+        """Refresh an existing row"""
+        self.responses[slot] = response
+        self.expires_at[slot] = expires_at
+        if query_hash is not None:
+            self._set_hash(slot, query_hash)
+    
+    def _set_hash(self, slot: int, query_hash: Optional[str]):
+        """Point a query hash at a row, unlinking the hash the row held before"""
+        previous = self.query_hashes[slot]
+        if previous is not None and self.slots_by_hash.get(previous) == slot:
+            del self.slots_by_hash[previous]
+        self.query_hashes[slot] = query_hash
+        if query_hash is not None:
+            self.slots_by_hash[query_hash] = slot
+
+
+class L1VectorCache:
+    """In-process per-user vector tier searched before Atlas Vector Search"""
+    
+    # Vectors this close are treated as the same cache entry
+    DUPLICATE_SCORE = 0.9999
+    
+    def __init__(
+        self,
+        max_entries: int = config.L1_CACHE_MAX_ENTRIES,
+        max_entries_per_user: int = config.L1_CACHE_MAX_ENTRIES_PER_USER,
+        ttl_seconds: int = config.L1_CACHE_TTL_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.max_entries_per_user = max_entries_per_user
+        self.ttl_seconds = ttl_seconds
+        self.size = 0
+        self._users: "OrderedDict[str, _UserVectors]" = OrderedDict()
+    
+    def search(self, user_id: str, embedding: List[float], threshold: float) -> Optional[Dict[str, Any]]:
+        """Return the best cached response for the user above threshold"""
+        start_time = time.time()
+        user_vectors = self._users.get(user_id)
+        result = None
+        
+        if user_vectors is not None:
+            self._users.move_to_end(user_id)
+            scores = user_vectors.scores(to_unit_vector(embedding))
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                result = {
+                    "response": user_vectors.responses[best],
+                    "vector_score": float(scores[best])
+                }
+        
+        metrics.record_histogram("l1_search_latency_ms", (time.time() - start_time) * 1000)
+        metrics.increment_counter("l1_cache_total", labels={"result": "hit" if result else "miss"})
+        return result
+    
+    def find_exact(self, user_id: str, query_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a normalized query hash, without any embedding work"""
+        user_vectors = self._users.get(user_id)
+        slot = user_vectors.find_exact(query_hash) if user_vectors is not None else None
+        
+        metrics.increment_counter("l1_exact_match_total", labels={"result": "miss" if slot is None else "hit"})
+        if slot is None:
+            return None
+        self._users.move_to_end(user_id)
+        return {"response": user_vectors.responses[slot], "vector_score": 1.0}
+    
+    def add(
+        self,
+        user_id: str,
+        embedding: List[float],
+        response: str,
+        query_hash: Optional[str] = None
+    ):
+        """Cache an entry's (vector, response) pair for the user, keyed by its query hash too"""
+        vector = to_unit_vector(embedding)
+        expires_at = time.time() + self.ttl_seconds
+        user_vectors = self._users.get(user_id)
+        
+        if user_vectors is None:
+            user_vectors = _UserVectors(self.max_entries_per_user)
+            self._users[user_id] = user_vectors
+        self._users.move_to_end(user_id)
+        
+        # Refresh a near-identical row instead of storing a duplicate
+        if len(user_vectors):
+            scores = user_vectors.scores(vector)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.DUPLICATE_SCORE:
+                user_vectors.update(best, response, expires_at, query_hash)
+                return
+        
+        before = len(user_vectors)
+        user_vectors.put(vector, response, expires_at, query_hash)
+        self.size += len(user_vectors) - before
+        
+        # Evict least recently used users until back under the global bound
+        while self.size > self.max_entries and len(self._users) > 1:
+            _, evicted = self._users.popitem(last=False)
+            self.size -= len(evicted)
+            metrics.increment_counter("l1_cache_evictions", value=len(evicted))
+        
+        metrics.set_gauge("l1_cache_entries", self.size)
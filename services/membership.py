@@ -0,0 +1,85 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import config
+from database.storage import StorageBackend, entry_expiry
+from monitoring.metrics import metrics
+from utils.logger import logger
+
+
+class UserMembership:
+    """Users known to have live cache entries, with the expiry of each one's newest entry"""
+    
+    def __init__(
+        self,
+        storage: StorageBackend,
+        refresh_seconds: int = config.USER_MEMBERSHIP_REFRESH_SECONDS
+    ):
+        self.storage = storage
+        self.refresh_seconds = refresh_seconds
+        self.ready = False
+        self._expires_at: Dict[str, float] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+    
+    def might_have_entries(self, user_id: str) -> bool:
+        """False only when the user is known to have no live entries"""
+        if not self.ready:
+            return True
+        expires_at = self._expires_at.get(user_id)
+        return expires_at is not None and expires_at > time.time()
+    
+    def record_save(self, user_id: str, timestamp: Optional[datetime]):
+        """Note a saved or refreshed entry"""
+        expires_at = entry_expiry(timestamp)
+        if expires_at > self._expires_at.get(user_id, 0.0):
+            self._expires_at[user_id] = expires_at
+    
+    async def refresh(self):
+        """Merge per-user expiries from storage and drop users whose entries have all expired"""
+        start_time = time.time()
+        expiries = await self.storage.user_expiries()
+        if expiries is None:
+            return
+        
+        # Only raise expiries: saves made while the scan ran must not be lost
+        for user_id, expires_at in expiries.items():
+            if expires_at > self._expires_at.get(user_id, 0.0):
+                self._expires_at[user_id] = expires_at
+        
+        now = time.time()
+        self._expires_at = {
+            user_id: expires_at for user_id, expires_at in self._expires_at.items() if expires_at > now
+        }
+        self.ready = True
+        
+        refresh_time = (time.time() - start_time) * 1000
+        metrics.record_histogram("user_membership_refresh_latency_ms", refresh_time)
+        metrics.set_gauge("user_membership_users", len(self._expires_at))
+        logger.info(f"Refreshed user membership in {refresh_time:.2f}ms ({len(self._expires_at)} users)")
+    
+    async def start(self):
+        """Load membership and keep refreshing it in the background"""
+        await self.refresh()
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._run_refresher())
+    
+    async def _run_refresher(self):
+        """Periodically reconcile with storage"""
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"User membership refresh failed: {e}")
+    
+    async def close(self):
+        """Stop the background refresher"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
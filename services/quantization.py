@@ -0,0 +1,78 @@
+from typing import Dict, List
+
+import numpy as np
+import torch
+
+import config
+from monitoring.metrics import metrics
+from utils.logger import logger
+from utils.vectors import similarity_scores
+
+# ONNX int8 graph shipped with all-MiniLM-L6-v2 that runs on any AVX2 CPU
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+# Paraphrase pairs and unrelated queries, so the check covers scores on both sides of the threshold
+CALIBRATION_QUERIES = [
+    "What items are not allowed through airport security?",
+    "Which things am I not allowed to bring through the security checkpoint?",
+    "My flight's been delayed due to storms. What are my options for rebooking?",
+    "The storm delayed my flight, how can I rebook or get compensation?",
+    "Can I bring my pet on the plane?",
+    "What are the rules for flying with a dog in the cabin?",
+    "What's the baggage allowance for my flight?",
+    "How many bags can I check and what if my suitcase is overweight?",
+    "How do I request wheelchair assistance at the airport?",
+    "My elderly mother needs help getting to her gate, what services are available?",
+    "How early should I arrive before an international flight?",
+    "Can I change the name on my ticket?",
+    "Do you offer vegetarian meals on long-haul flights?",
+    "Where can I find my booking reference?",
+    "Is there wifi on board and how much does it cost?",
+    "How do I get a refund for a cancelled flight?",
+]
+
+
+def load_calibration_queries() -> List[str]:
+    """Calibration texts from EMBEDDING_CALIBRATION_FILE (one per line), or the built-in set"""
+    if not config.EMBEDDING_CALIBRATION_FILE:
+        return CALIBRATION_QUERIES
+    with open(config.EMBEDDING_CALIBRATION_FILE, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def quantize_dynamic_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Quantize the weights of every Linear layer to int8 (CPU only)"""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def measure_drift(reference: np.ndarray, quantized: np.ndarray) -> Dict[str, float]:
+    """Compare quantized embeddings with fp32 ones and record the drift as gauges"""
+    # Both sets are unit vectors, so the row-wise dot product is the cosine
+    cosines = np.sum(reference * quantized, axis=1)
+    
+    # Share of calibration pairs whose hit/miss decision is unchanged at the default threshold
+    agree = total = 0
+    for i in range(len(reference) - 1):
+        reference_hits = similarity_scores(reference[i + 1:], reference[i]) >= config.SIMILARITY_THRESHOLD
+        quantized_hits = similarity_scores(quantized[i + 1:], quantized[i]) >= config.SIMILARITY_THRESHOLD
+        agree += int(np.sum(reference_hits == quantized_hits))
+        total += len(reference_hits)
+    
+    report = {
+        "cosine_mean": float(np.mean(cosines)),
+        "cosine_min": float(np.min(cosines)),
+        "decision_agreement": agree / total if total else 1.0
+    }
+    for name, value in report.items():
+        metrics.set_gauge(f"embedding_quantization_{name}", value)
+    
+    logger.info(
+        f"INT8 self-check on {len(reference)} texts: cosine mean={report['cosine_mean']:.4f} "
+        f"min={report['cosine_min']:.4f}, hit/miss agreement={report['decision_agreement']:.2%}"
+    )
+    if report["cosine_min"] < config.EMBEDDING_QUANTIZATION_MIN_COSINE:
+        logger.warning(
+            f"INT8 embeddings drift from fp32 beyond EMBEDDING_QUANTIZATION_MIN_COSINE "
+            f"({report['cosine_min']:.4f} < {config.EMBEDDING_QUANTIZATION_MIN_COSINE})"
+        )
+    return report
@@ -0,0 +1,96 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import config
+from models.pydantic_models import CacheEntry
+from monitoring.metrics import metrics
+from utils.logger import logger
+
+
+class SaveQueue:
+    """Bounded queue of accepted saves drained in batches by background workers"""
+    
+    def __init__(
+        self,
+        save_batch_fn: Callable[[List[CacheEntry]], Awaitable[Dict[str, Any]]],
+        max_size: int = config.ASYNC_SAVE_QUEUE_SIZE,
+        num_workers: int = config.ASYNC_SAVE_WORKERS,
+        max_batch_size: int = config.ASYNC_SAVE_MAX_BATCH_SIZE,
+        max_wait_ms: float = config.ASYNC_SAVE_MAX_WAIT_MS
+    ):
+        self.save_batch_fn = save_batch_fn
+        self.num_workers = num_workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "asyncio.Queue[Tuple[CacheEntry, float]]" = asyncio.Queue(maxsize=max_size)
+        self._workers: List[asyncio.Task] = []
+        self._closing = False
+    
+    def enqueue(self, entry: CacheEntry) -> bool:
+        """Accept an entry for saving, or return False when the queue is full"""
+        if self._closing:
+            return False
+        try:
+            self._queue.put_nowait((entry, time.time()))
+        except asyncio.QueueFull:
+            metrics.increment_counter("save_queue_rejected")
+            return False
+        
+        metrics.set_gauge("save_queue_depth", self._queue.qsize())
+        return True
+    
+    def start(self):
+        """Start the background workers"""
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._run()) for _ in range(self.num_workers)]
+    
+    async def _run(self):
+        """Take one entry, wait briefly for more, then save them as one batch"""
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self._save_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    async def _save_batch(self, batch: List[Tuple[CacheEntry, float]]):
+        """Save a batch and record how long its entries waited"""
+        metrics.set_gauge("save_queue_depth", self._queue.qsize())
+        try:
+            result = await self.save_batch_fn([entry for entry, _ in batch])
+            failed = result["failed"]
+        except Exception as e:
+            logger.error(f"Queued save batch failed: {e}")
+            failed = len(batch)
+        
+        now = time.time()
+        for _, enqueued_at in batch:
+            metrics.record_histogram("save_queue_lag_ms", (now - enqueued_at) * 1000)
+        if failed:
+            metrics.increment_counter("save_queue_failed", value=failed)
+    
+    async def close(self, timeout: Optional[float] = None):
+        """Stop accepting entries, drain the queue and stop the workers"""
+        self._closing = True
+        if self._workers:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self._queue.qsize()} queued saves on shutdown")
+        
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
@@ -0,0 +1,13 @@
+import hashlib
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text (whitespace and case) for exact-match keys"""
+    # all-MiniLM-L6-v2 uses an uncased tokenizer that splits on whitespace,
+    # so these variants produce identical embeddings
+    return " ".join(text.split()).lower()
+
+
+def query_hash(text: str) -> str:
+    """Stable hash of the normalized query text"""
+    return hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
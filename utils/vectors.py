@@ -0,0 +1,21 @@
+import numpy as np
+
+import config
+
+
+def to_unit_vector(embedding) -> np.ndarray:
+    """Convert an embedding to a unit-length float32 array"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def similarity_scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Score unit-vector rows against a unit query on the Atlas Vector Search scale"""
+    dots = matrix @ query
+    if config.VECTOR_SIMILARITY == "euclidean":
+        # Atlas euclidean score is 1 / (1 + distance)
+        distances = np.sqrt(np.maximum(2.0 - 2.0 * dots, 0.0))
+        return 1.0 / (1.0 + distances)
+    # Atlas cosine and dotProduct scores are (1 + similarity) / 2
+    return (1.0 + dots) / 2.0